@@ -0,0 +1,132 @@
+# app/core/allocation.py
+#
+# Batch room assignment for semester start. Pure planning, no I/O: the
+# router loads free beds and eligible students, calls plan_allocation()
+# and writes the result in one transaction.
+#
+# Roommate requests are merged into groups (union-find) that must share a
+# room. Groups are then placed most-constrained first, largest first, each
+# into the matching room with the fewest free beds that still fits it
+# (best-fit decreasing), so partly filled rooms are topped up and empty
+# rooms are kept for the groups that need them. Free beds are bucketed by
+# (block, room_type) and by free count, so each placement costs
+# O(buckets x max capacity) regardless of how many rooms there are.
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+NO_MATCHING_ROOM = "No room with enough free beds matches the preferences"
+
+
+class FreeRoom(NamedTuple):
+    id: int
+    room_number: str
+    block: str
+    room_type: str
+    free: int
+
+
+class StudentPreference(NamedTuple):
+    username: str
+    block: Optional[str]
+    room_type: Optional[str]
+    roommates: Sequence[str]
+
+
+class AllocationPlan(NamedTuple):
+    placed: Dict[str, FreeRoom]  # username -> room, in placement order
+    unplaced: Dict[str, str]  # username -> reason
+
+
+def _roommate_groups(students: Sequence[StudentPreference]) -> List[List[StudentPreference]]:
+    index = {s.username: i for i, s in enumerate(students)}
+    parent = list(range(len(students)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, s in enumerate(students):
+        for mate in s.roommates:
+            j = index.get(mate)
+            if j is not None:
+                parent[find(i)] = find(j)
+
+    groups: Dict[int, List[StudentPreference]] = defaultdict(list)
+    for i, s in enumerate(students):
+        groups[find(i)].append(s)
+    return list(groups.values())
+
+
+def _group_preference(group: List[StudentPreference]) -> Tuple[Optional[str], Optional[str]]:
+    # first member (in request order) to state a preference decides it
+    block = next((s.block for s in group if s.block), None)
+    room_type = next((s.room_type for s in group if s.room_type), None)
+    return block, room_type
+
+
+class _FreeBeds:
+    def __init__(self, rooms: Iterable[FreeRoom]):
+        # (block, room_type) -> free beds -> rooms, popped from the end
+        self.buckets: Dict[Tuple[str, str], Dict[int, List[FreeRoom]]] = defaultdict(
+            lambda: defaultdict(list)
+        )
+        self.max_free = 0
+        for room in sorted(rooms, key=lambda r: r.room_number, reverse=True):
+            if room.free > 0:
+                self.buckets[(room.block, room.room_type)][room.free].append(room)
+                self.max_free = max(self.max_free, room.free)
+
+    def take(self, size: int, block: Optional[str], room_type: Optional[str]) -> Optional[FreeRoom]:
+        candidates = [
+            by_free
+            for (b, t), by_free in self.buckets.items()
+            if (block is None or b == block) and (room_type is None or t == room_type)
+        ]
+        for free in range(size, self.max_free + 1):
+            for by_free in candidates:
+                if by_free[free]:
+                    room = by_free[free].pop()
+                    if free > size:
+                        by_free[free - size].append(room._replace(free=free - size))
+                    return room
+        return None
+
+
+def plan_allocation(
+    students: Sequence[StudentPreference], rooms: Iterable[FreeRoom]
+) -> AllocationPlan:
+    """Assign students to rooms without exceeding any room's free beds."""
+    beds = _FreeBeds(rooms)
+    placed: Dict[str, FreeRoom] = {}
+    unplaced: Dict[str, str] = {}
+
+    groups = []
+    for group in _roommate_groups(students):
+        block, room_type = _group_preference(group)
+        if len(group) > 1 and len(group) > beds.max_free:
+            # no room could ever hold them together: place them one by one
+            groups.extend(([s], block, room_type) for s in group)
+        else:
+            groups.append((group, block, room_type))
+    groups.sort(key=lambda g: (-((g[1] is not None) + (g[2] is not None)), -len(g[0])))
+
+    for group, block, room_type in groups:
+        room = beds.take(len(group), block, room_type)
+        if room is None and len(group) > 1:
+            # keep the preferences but give up on sharing a room
+            for s in group:
+                single = beds.take(1, block, room_type)
+                if single is None:
+                    unplaced[s.username] = NO_MATCHING_ROOM
+                else:
+                    placed[s.username] = single
+            continue
+        for s in group:
+            if room is None:
+                unplaced[s.username] = NO_MATCHING_ROOM
+            else:
+                placed[s.username] = room
+    return AllocationPlan(placed=placed, unplaced=unplaced)
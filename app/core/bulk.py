@@ -0,0 +1,129 @@
+# app/core/bulk.py
+#
+# Dialect-aware multi-row INSERT helpers. The app runs on PostgreSQL in
+# production, MySQL on some installs and SQLite locally, and each spells
+# "insert, but don't fail on duplicates", "insert or update" and "insert or
+# add to" differently.
+
+from typing import Dict, List, Sequence
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def _dialect_insert(db: AsyncSession, model):
+    name = db.bind.dialect.name
+    if name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert(model)
+    if name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert(model)
+    if name in {"mysql", "mariadb"}:
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        return mysql_insert(model)
+    return None
+
+
+async def insert_ignore(db: AsyncSession, model, rows: List[Dict]) -> int:
+    """Insert rows in one statement, skipping any that hit a unique constraint.
+
+    Returns how many rows were inserted (exact for a single row; some drivers
+    report -1 for multi-row batches).
+    """
+    if not rows:
+        return 0
+
+    stmt = _dialect_insert(db, model)
+    if stmt is None:
+        # unknown backend: fall back to one savepoint per row
+        inserted = 0
+        for row in rows:
+            try:
+                async with db.begin_nested():
+                    await db.execute(insert(model).values(**row))
+                inserted += 1
+            except IntegrityError:
+                pass
+        return inserted
+
+    if db.bind.dialect.name in {"mysql", "mariadb"}:
+        stmt = stmt.prefix_with("IGNORE")
+    else:
+        stmt = stmt.on_conflict_do_nothing()
+    if len(rows) == 1:
+        result = await db.execute(stmt.values(**rows[0]))
+    else:
+        result = await db.execute(stmt, rows)
+    # executemany results don't always carry a rowcount
+    return getattr(result, "rowcount", -1)
+
+
+async def upsert(
+    db: AsyncSession,
+    model,
+    rows: List[Dict],
+    index_elements: Sequence[str],
+    update_columns: Sequence[str],
+) -> None:
+    """Insert rows in one statement, overwriting update_columns where the
+    unique key index_elements already exists."""
+    if not rows:
+        return
+
+    stmt = _dialect_insert(db, model)
+    if stmt is None:
+        # unknown backend: fall back to query-then-write per row
+        for row in rows:
+            key = [getattr(model, k) == row[k] for k in index_elements]
+            obj = await db.scalar(select(model).where(*key))
+            if obj is None:
+                db.add(model(**row))
+            else:
+                for col in update_columns:
+                    setattr(obj, col, row[col])
+        await db.flush()
+        return
+
+    if db.bind.dialect.name in {"mysql", "mariadb"}:
+        stmt = stmt.on_duplicate_key_update(
+            {col: stmt.inserted[col] for col in update_columns}
+        )
+    else:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(index_elements),
+            set_={col: stmt.excluded[col] for col in update_columns},
+        )
+    await db.execute(stmt, rows)
+
+
+async def upsert_add(
+    db: AsyncSession,
+    model,
+    row: Dict,
+    index_elements: Sequence[str],
+    increments: Dict[str, object],
+) -> None:
+    """Insert row, or if its unique key index_elements exists, add increments
+    to those columns instead. One statement, so concurrent first writes for
+    the same key can't both insert."""
+    stmt = _dialect_insert(db, model)
+    if stmt is None:
+        # unknown backend: insert-or-ignore, then the relative UPDATE
+        if not await insert_ignore(db, model, [row]):
+            key = [getattr(model, k) == row[k] for k in index_elements]
+            await db.execute(
+                update(model)
+                .where(*key)
+                .values({col: getattr(model, col) + delta for col, delta in increments.items()})
+            )
+        return
+
+    stmt = stmt.values(**row)
+    added = {col: getattr(model, col) + delta for col, delta in increments.items()}
+    if db.bind.dialect.name in {"mysql", "mariadb"}:
+        stmt = stmt.on_duplicate_key_update(added)
+    else:
+        stmt = stmt.on_conflict_do_update(index_elements=list(index_elements), set_=added)
+    await db.execute(stmt)
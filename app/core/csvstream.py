@@ -0,0 +1,53 @@
+# app/core/csvstream.py
+#
+# Incremental CSV reading for bulk imports. Starlette has already spooled
+# the multipart upload to a temp file; rows are parsed from it a batch at
+# a time on a worker thread, so memory is one batch however long the file.
+
+import csv
+import io
+from itertools import islice
+from typing import AsyncIterator, Dict, List, Sequence, Tuple
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+# (line number, row) — line numbers count the header as line 1
+CsvRow = Tuple[int, Dict[str, str]]
+
+
+def _open_reader(upload: UploadFile, required: Sequence[str]) -> csv.DictReader:
+    upload.file.seek(0)
+    text = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+    try:
+        fieldnames = [f.strip() for f in reader.fieldnames or []]
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid CSV: {e}")
+    missing = [name for name in required if name not in fieldnames]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"CSV is missing columns: {', '.join(missing)}")
+    reader.fieldnames = fieldnames
+    return reader
+
+
+def _next_batch(reader: csv.DictReader, size: int) -> List[CsvRow]:
+    try:
+        # line_num after reading a row is its last physical line
+        return [(reader.line_num, row) for row in islice(reader, size)]
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid CSV near line {reader.line_num}: {e}")
+
+
+async def iter_csv_batches(
+    upload: UploadFile,
+    required: Sequence[str],
+    batch_size: int = 1000,
+) -> AsyncIterator[List[CsvRow]]:
+    """Yield the upload's rows in batches of up to batch_size."""
+    reader = await run_in_threadpool(_open_reader, upload, required)
+    while True:
+        batch = await run_in_threadpool(_next_batch, reader, batch_size)
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,42 @@
+# app/core/events.py
+#
+# In-process pub/sub for pushing status changes to the user they concern
+# (see app/routers/events.py). Each worker process has its own broker, so a
+# client only hears about changes made through the worker it is connected
+# to; clients re-fetch their lists whenever the stream (re)connects.
+
+import asyncio
+from collections import defaultdict
+from typing import Any, Dict, Set
+
+
+class EventBroker:
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+
+    def subscribe(self, username: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[username].add(queue)
+        return queue
+
+    def unsubscribe(self, username: str, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(username)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[username]
+
+    def publish(self, username: str, event: str, data: Any) -> int:
+        """Queue an event for every open stream of username; never blocks."""
+        queues = self._subscribers.get(username, ())
+        for queue in queues:
+            if queue.full():
+                # a stalled client loses its oldest event, not the newest
+                queue.get_nowait()
+            queue.put_nowait((event, data))
+        return len(queues)
+
+
+broker = EventBroker()
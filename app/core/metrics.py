@@ -0,0 +1,212 @@
+# app/core/metrics.py
+#
+# Low-overhead request metrics in Prometheus text format. Everything lives
+# in process memory: counters and fixed-bucket histograms keyed by label
+# tuples, so recording a request is a few dict lookups under one lock.
+# Each worker process exposes its own numbers; Prometheus sums them.
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+from app.database import pool_stats
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_fmt_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str],
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self.values: Dict[Labels, List[float]] = {}
+
+    def observe(self, labels: Labels, value: float) -> None:
+        row = self.values.get(labels)
+        if row is None:
+            row = self.values[labels] = [0.0] * (len(self.buckets) + 2)
+        row[bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, row in sorted(self.values.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), row[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _fmt_labels(self.label_names + ("le",), labels + (le,))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            base = _fmt_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{base} {row[-1]}")
+            lines.append(f"{self.name}_count{base} {cumulative}")
+        return lines
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+_lock = threading.Lock()
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled.", ("method", "route", "status")
+)
+ERRORS = Counter(
+    "http_request_errors_total", "HTTP requests that failed with a 5xx or an exception.", ("method", "route")
+)
+LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency.", ("method", "route", "status")
+)
+DB_TIME = Histogram(
+    "http_request_db_seconds", "Time spent in SQL statements per request.", ("method", "route")
+)
+DB_QUERIES = Counter(
+    "http_request_db_queries_total", "SQL statements executed while serving requests.", ("method", "route")
+)
+
+_ALL = (REQUESTS, ERRORS, LATENCY, DB_TIME, DB_QUERIES)
+
+
+def _render_pools() -> List[str]:
+    # read live from the pools at scrape time rather than tracked per checkout
+    name = "db_pool_connections"
+    lines = [f"# HELP {name} Database pool connections by engine and state.", f"# TYPE {name} gauge"]
+    for engine, states in sorted(pool_stats().items()):
+        for state, value in states.items():
+            lines.append(f"{name}{_fmt_labels(('engine', 'state'), (engine, state))} {value}")
+    return lines
+
+
+def render_metrics() -> str:
+    with _lock:
+        lines: List[str] = []
+        for metric in _ALL:
+            lines.extend(metric.render())
+    lines.extend(_render_pools())
+    return "\n".join(lines) + "\n"
+
+
+# ---------- per-request DB timing ----------
+
+class _DBTimer:
+    __slots__ = ("seconds", "queries")
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.queries = 0
+
+
+_current_db_timer: ContextVar[Optional[_DBTimer]] = ContextVar("current_db_timer", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start"].pop()
+    timer = _current_db_timer.get()
+    if timer is not None:
+        timer.seconds += time.perf_counter() - started
+        timer.queries += 1
+
+
+def instrument_engine(sync_engine) -> None:
+    """Attribute SQL time to the request being served.
+
+    Pass an Engine, an async engine's .sync_engine, or the Engine class to
+    cover every engine created later.
+    """
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ---------- ASGI middleware ----------
+
+class MetricsMiddleware:
+    """Records count, errors, latency and DB time per route template."""
+
+    def __init__(self, app, skip_paths: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.skip_paths = set(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status_holder = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+            await send(message)
+
+        timer = _DBTimer()
+        token = _current_db_timer.set(timer)
+        started = time.perf_counter()
+        failed = False
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_db_timer.reset(token)
+
+            # route template (e.g. /api/gatepass/{gatepass_id}/decide), not the raw
+            # path, so label cardinality stays bounded
+            route = scope.get("route")
+            route_label = getattr(route, "path", None) or "other"  # static files, 404s
+            method = scope["method"]
+            status = status_holder["status"]
+
+            with _lock:
+                REQUESTS.inc((method, route_label, str(status)))
+                LATENCY.observe((method, route_label, str(status)), elapsed)
+                if failed or status >= 500:
+                    ERRORS.inc((method, route_label))
+                if timer.queries:
+                    DB_TIME.observe((method, route_label), timer.seconds)
+                    DB_QUERIES.inc((method, route_label), timer.queries)
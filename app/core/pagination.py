@@ -0,0 +1,92 @@
+# app/core/pagination.py
+#
+# Keyset ("cursor") pagination for list endpoints. Instead of OFFSET, each
+# page continues strictly after the last row of the previous one, so page
+# N costs the same as page 1 as long as the ordering columns are indexed.
+#
+# The list body keeps its existing shape; the cursor for the next page is
+# returned in the X-Next-Cursor response header and passed back as ?after=.
+
+import base64
+import json
+from datetime import date, datetime
+from typing import List, Optional, Sequence
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class PageParams:
+    """Query parameters shared by every paginated endpoint."""
+
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+        after: Optional[str] = None,
+    ):
+        self.limit = limit
+        self.after = after
+
+
+def _encode_cursor(row, columns) -> str:
+    values = []
+    for col in columns:
+        value = getattr(row, col.key)
+        if isinstance(value, (date, datetime)):
+            value = value.isoformat()
+        values.append(value)
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_cursor(cursor: str, columns) -> List:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(values) != len(columns):
+            raise ValueError("cursor does not match ordering")
+        decoded = []
+        for col, value in zip(columns, values):
+            python_type = col.type.python_type
+            if python_type in (date, datetime):
+                decoded.append(python_type.fromisoformat(value))
+            else:
+                decoded.append(python_type(value))
+        return decoded
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def paginate(
+    db: AsyncSession,
+    stmt,
+    order_by: Sequence,
+    page: PageParams,
+    response: Response,
+    descending: bool = False,
+) -> list:
+    """Run a select() with ORDER BY/LIMIT and ?after=; set X-Next-Cursor if more rows exist.
+
+    order_by must end in a unique column (normally id) so the order is total.
+    """
+    if page.after:
+        keys = _decode_cursor(page.after, order_by)
+        # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y)
+        clauses = []
+        for i, col in enumerate(order_by):
+            prefix = [order_by[j] == keys[j] for j in range(i)]
+            clauses.append(and_(*prefix, col < keys[i] if descending else col > keys[i]))
+        stmt = stmt.where(or_(*clauses))
+
+    ordering = [col.desc() if descending else col.asc() for col in order_by]
+    result = await db.execute(stmt.order_by(*ordering).limit(page.limit + 1))
+    rows = result.scalars().all()
+
+    if len(rows) > page.limit:
+        rows = rows[: page.limit]
+        response.headers[NEXT_CURSOR_HEADER] = _encode_cursor(rows[-1], order_by)
+    return rows
@@ -1,9 +1,8 @@
 from datetime import datetime, timedelta
 from typing import Optional
 
-from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
+from jose import jwt
 
 SECRET_KEY = "super-secret-key-change-this"
 ALGORITHM = "HS256"
@@ -29,20 +28,6 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    """Decode JWT token and return basic user info."""
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        role: str = payload.get("role")
-        if username is None or role is None:
-            raise credentials_exception
-        return {"username": username, "role": role}
-    except JWTError:
-        raise credentials_exception
+def decode_access_token(token: str) -> dict:
+    """Verify signature and expiry; raises JWTError on any problem."""
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -0,0 +1,147 @@
+# app/core/storage.py
+#
+# Streaming upload handling. Uploads are copied to a temp file in fixed-size
+# chunks on a worker thread (so the event loop never blocks on disk I/O),
+# hashed as they go, size-capped, and only then renamed into place.
+#
+# By the time a handler sees an UploadFile, Starlette has already spooled
+# the whole multipart body, so the cap in stage_upload alone can't stop a
+# huge upload from being received. UploadSizeLimitMiddleware rejects it
+# from the Content-Length header before the body is read; stage_upload
+# still enforces the exact cap for requests sent without one (chunked).
+
+import hashlib
+import os
+import tempfile
+from typing import List, NamedTuple, Sequence, Tuple
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+CHUNK_SIZE = 1024 * 1024  # 1 MiB
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+# room for multipart boundaries, part headers and small form fields
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class StagedUpload(NamedTuple):
+    temp_path: str
+    size: int
+    sha256: str
+
+
+def _make_temp(directory: str):
+    # created lazily so importing the app has no filesystem side effects
+    os.makedirs(directory, exist_ok=True)
+    return tempfile.mkstemp(dir=directory, suffix=".part")
+
+
+def _write_chunk(out, digest, chunk: bytes) -> None:
+    digest.update(chunk)
+    out.write(chunk)
+
+
+def _close_and_sync(out) -> None:
+    out.flush()
+    os.fsync(out.fileno())
+    out.close()
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File too large (max {max_bytes // (1024 * 1024)} MB)",
+    )
+
+
+class UploadSizeLimitMiddleware:
+    """413 for requests to `paths` whose Content-Length exceeds the upload cap."""
+
+    def __init__(self, app, paths: Sequence[str], max_bytes: int = MAX_UPLOAD_BYTES):
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.paths:
+            length = dict(scope["headers"]).get(b"content-length")
+            if length is not None and length.isdigit() and int(length) > self.max_bytes + MULTIPART_OVERHEAD:
+                # the body is never read; the server drops the connection
+                response = JSONResponse({"detail": _too_large(self.max_bytes).detail}, status_code=413)
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+async def stage_upload(
+    upload: UploadFile,
+    directory: str,
+    max_bytes: int = MAX_UPLOAD_BYTES,
+) -> StagedUpload:
+    """Copy an upload into a temp file in `directory`; memory use is one chunk."""
+    if upload.size is not None and upload.size > max_bytes:
+        raise _too_large(max_bytes)
+
+    fd, temp_path = await run_in_threadpool(_make_temp, directory)
+    out = os.fdopen(fd, "wb")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            chunk = await upload.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise _too_large(max_bytes)
+            await run_in_threadpool(_write_chunk, out, digest, chunk)
+        await run_in_threadpool(_close_and_sync, out)
+    except BaseException:
+        out.close()
+        await run_in_threadpool(_remove_quietly, temp_path)
+        raise
+
+    return StagedUpload(temp_path=temp_path, size=size, sha256=digest.hexdigest())
+
+
+def _move_into_place(temp_path: str, final_path: str) -> None:
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    os.replace(temp_path, final_path)
+
+
+async def commit_upload(staged: StagedUpload, final_path: str) -> None:
+    """Atomically move a staged upload into place (same filesystem rename)."""
+    await run_in_threadpool(_move_into_place, staged.temp_path, final_path)
+
+
+async def discard_upload(staged: StagedUpload) -> None:
+    await run_in_threadpool(_remove_quietly, staged.temp_path)
+
+
+async def remove_file(path: str) -> None:
+    await run_in_threadpool(_remove_quietly, path)
+
+
+def _walk_files(directory: str) -> List[Tuple[str, int]]:
+    found = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                found.append((path, os.path.getsize(path)))
+            except FileNotFoundError:
+                pass
+    return found
+
+
+async def list_files(directory: str) -> List[Tuple[str, int]]:
+    """(path, size) of every file under directory; empty if it doesn't exist."""
+    return await run_in_threadpool(_walk_files, directory)
@@ -1,65 +1,118 @@
 # app/dependencies.py
 
-from typing import Dict, Generator
+import time
+from typing import AsyncGenerator, Dict
 
 from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-
-from app.database import SessionLocal          # for real DB access
-from app.models import users                   # fake_users_db lives here
+from jose import JWTError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import (  # for real DB access
+    AsyncReadSessionLocal,
+    AsyncSessionLocal,
+    get_async_engine,
+    get_async_read_engine,
+)
+from app.models.users import UserDB
 from app.core import security
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/token")
+from app.core.cache import TTLCache
 
 
 # --- DB session dependency (for rooms, fees, etc.) ---
 
-def get_db() -> Generator[Session, None, None]:
-    db = SessionLocal()
-    try:
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    get_async_engine()  # binds AsyncSessionLocal on first use
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
-# --- Auth using fake_users_db ---
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    # read-only endpoints: the replica if one is configured, else the primary.
+    # A replica may lag, so never use this for read-after-write checks.
+    get_async_read_engine()
+    async with AsyncReadSessionLocal() as db:
+        yield db
 
-def get_user(username: str) -> Dict | None:
-    return users.fake_users_db.get(username)
 
+# --- Auth against the users table, with in-process caches ---
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-):
-    try:
+# token -> decoded JWT payload, so repeat requests skip signature checks
+_token_cache = TTLCache(maxsize=10_000, ttl=300)
+# username -> principal dict; dropped by invalidate_user() on edits, and the
+# short TTL bounds staleness in other worker processes
+_principal_cache = TTLCache(maxsize=10_000, ttl=60)
+
+
+def _credentials_error(detail: str = "Invalid authentication credentials") -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def _to_principal(user: UserDB) -> Dict:
+    return {
+        "username": user.username,
+        "full_name": user.full_name,
+        "role": user.role,
+        "disabled": user.disabled,
+    }
+
+
+def invalidate_user(username: str) -> None:
+    """Call after changing a user's role, password or disabled flag."""
+    _principal_cache.pop(username)
+
+
+def _decode_token(token: str) -> Dict:
+    payload = _token_cache.get(token)
+    if payload is None:
         payload = security.decode_access_token(token)
-    except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        remaining = payload.get("exp", 0) - time.time()
+        _token_cache.set(token, payload, ttl=min(_token_cache.ttl, remaining))
+    return payload
+
+
+async def get_user(db: AsyncSession, username: str) -> Dict | None:
+    principal = _principal_cache.get(username)
+    if principal is None:
+        user = await db.scalar(select(UserDB).where(UserDB.username == username))
+        if user is None:
+            return None
+        principal = _to_principal(user)
+        _principal_cache.set(username, principal)
+    return principal
+
+
+async def resolve_user(token: str, db: AsyncSession) -> Dict:
+    """Principal for a bearer token, or 401."""
+    try:
+        payload = _decode_token(token)
+    except JWTError:
+        raise _credentials_error()
 
     username: str | None = payload.get("sub")
     if username is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _credentials_error()
 
-    user = get_user(username)
+    user = await get_user(db, username)
     if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _credentials_error("User not found")
+    if user["disabled"]:
+        raise _credentials_error("User is disabled")
 
     return user
 
 
+async def get_current_user(
+    token: str = Depends(security.oauth2_scheme),
+    db: AsyncSession = Depends(get_db),
+):
+    return await resolve_user(token, db)
+
+
 def get_current_admin_user(
     current_user: dict = Depends(get_current_user),
 ):
@@ -1,8 +1,15 @@
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from sqlalchemy.engine import Engine
 
-from app.database import Base, engine
+from app.core.metrics import MetricsMiddleware, instrument_engine
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.storage import UploadSizeLimitMiddleware
+from app.database import dispose_engines, init_engines
 from app.models import rooms as rooms_models
 from app.models import maintenance as maintenance_models   # NEW
 from app.models import mess as mess_models
@@ -10,6 +17,7 @@ from app.models import hostel_attendance as hostel_attendance_models
 from app.models import fees as fees_models
 from app.models import gatepass as gatepass_models
 from app.models import documents as documents_models
+from app.models import users as users_models
 
 from app.routers import (
     auth,
@@ -20,29 +28,63 @@ from app.routers import (
     fees,
     gatepass,
     documents,
+    users,
+    metrics,
+    events,
 )
 
-app = FastAPI(title="Hostel ERP System")
+# Schema changes are NOT applied on worker startup; run them once per deploy:
+#   python -m app.migrations
+# For local development, RUN_MIGRATIONS_ON_STARTUP=1 restores the old behaviour.
 
-# Create database tables (rooms, maintenance, etc.)
-Base.metadata.create_all(bind=engine)
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_engines()
+    if os.getenv("RUN_MIGRATIONS_ON_STARTUP") == "1":
+        from starlette.concurrency import run_in_threadpool
+        from app.migrations import run_all
+        await run_in_threadpool(run_all)
+    yield
+    await dispose_engines()
+
+
+def create_app() -> FastAPI:
+    app = FastAPI(title="Hostel ERP System", lifespan=lifespan)
+
+    # every engine, including ones created after this point
+    instrument_engine(Engine)
+
+    # innermost, so an early 413 still gets CORS headers and is counted
+    app.add_middleware(UploadSizeLimitMiddleware, paths=("/api/documents/upload",))
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER],
+    )
+    # outermost, so time spent in CORS handling is included; long-lived
+    # event streams would only skew the latency histograms
+    app.add_middleware(MetricsMiddleware, skip_paths=("/metrics", "/api/events/"))
+
+    app.include_router(auth.router)
+    app.include_router(rooms.router)
+    app.include_router(maintenance.router)
+    app.include_router(mess.router)
+    app.include_router(hostel_attendance.router)
+    app.include_router(fees.router)
+    app.include_router(gatepass.router)
+    app.include_router(documents.router)
+    app.include_router(users.router)
+    app.include_router(metrics.router)
+    app.include_router(events.router)
+
+    # Static frontend – SERVE frontend AT ROOT
+    app.mount("/", StaticFiles(directory="frontend", html=True), name="frontend")
+
+    return app
+
 
-app.include_router(auth.router)
-app.include_router(rooms.router)
-app.include_router(maintenance.router)
-app.include_router(mess.router)
-app.include_router(hostel_attendance.router)
-app.include_router(fees.router)
-app.include_router(gatepass.router)
-app.include_router(documents.router)
-
-# Static frontend – SERVE frontend AT ROOT
-app.mount("/", StaticFiles(directory="frontend", html=True), name="frontend")
+app = create_app()
@@ -0,0 +1,395 @@
+# app/migrations.py
+#
+# One-off data migrations from the old comma-separated columns to the
+# normalized tables. Safe to run repeatedly: migrated rows are cleared.
+#
+#   python -m app.migrations
+
+import hashlib
+import os
+import shutil
+from datetime import datetime
+
+from sqlalchemy import func, inspect, text
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.orm import Session
+
+from app.database import Base, SessionLocal, get_engine
+from app.models import (  # noqa: F401  (register every table for create_all)
+    documents,
+    fees,
+    gatepass,
+    hostel_attendance,
+    maintenance,
+    mess,
+    rooms,
+    users,
+)
+from app.models.documents import UPLOAD_DIR, DocumentBlobDB, DocumentDB, blob_path
+from app.models.hostel_attendance import HostelAttendanceDB, HostelAttendanceEntryDB
+from app.models.mess import (
+    DailyMenuDB,
+    MealAttendanceDB,
+    MealAttendanceEntryDB,
+    MealHeadcountDB,
+    MealStatsDB,
+    MealStatsDailyDB,
+    month_start,
+    week_start,
+)
+from app.models.fees import FeeLedgerEntryDB, FeeRecordDB
+from app.models.maintenance import TICKET_FTS_TABLE
+from app.models.rooms import RoomAllocationDB, RoomDB
+from app.models.users import UserDB, fake_users_db
+
+
+def migrate_hostel_attendance(db: Session) -> int:
+    """Move HostelAttendanceDB.present_usernames into per-student rows."""
+    moved = 0
+    legacy_rows = (
+        db.query(HostelAttendanceDB)
+        .filter(HostelAttendanceDB.present_usernames != "")
+        .all()
+    )
+    for row in legacy_rows:
+        existing = {
+            username
+            for (username,) in db.query(HostelAttendanceEntryDB.username)
+            .filter(HostelAttendanceEntryDB.day == row.day)
+        }
+        for username in set(row.present_usernames.split(",")) - existing:
+            if username:
+                db.add(HostelAttendanceEntryDB(day=row.day, username=username))
+                moved += 1
+        row.present_usernames = ""
+
+    db.commit()
+    return moved
+
+
+def migrate_meal_attendance(db: Session) -> int:
+    """Move MealAttendanceDB.attendees into per-student rows and headcounts."""
+    moved = 0
+    legacy_rows = (
+        db.query(MealAttendanceDB)
+        .filter(MealAttendanceDB.attendees != "")
+        .all()
+    )
+    for row in legacy_rows:
+        existing = {
+            username
+            for (username,) in db.query(MealAttendanceEntryDB.username)
+            .filter(MealAttendanceEntryDB.day == row.day, MealAttendanceEntryDB.meal == row.meal)
+        }
+        for username in set(row.attendees.split(",")) - existing:
+            if username:
+                db.add(MealAttendanceEntryDB(day=row.day, meal=row.meal, username=username))
+                moved += 1
+        row.attendees = ""
+        db.flush()
+
+        total = (
+            db.query(func.count(MealAttendanceEntryDB.id))
+            .filter(MealAttendanceEntryDB.day == row.day, MealAttendanceEntryDB.meal == row.meal)
+            .scalar()
+        )
+        counter = (
+            db.query(MealHeadcountDB)
+            .filter(MealHeadcountDB.day == row.day, MealHeadcountDB.meal == row.meal)
+            .first()
+        )
+        if counter is None:
+            db.add(MealHeadcountDB(day=row.day, meal=row.meal, headcount=total))
+        else:
+            counter.headcount = total
+
+    db.commit()
+    return moved
+
+
+def rebuild_meal_stats_daily(db: Session) -> int:
+    """Recompute the MealStatsDailyDB rollup from MealStatsDB."""
+    totals = (
+        db.query(
+            MealStatsDB.day,
+            MealStatsDB.meal,
+            func.sum(MealStatsDB.plates_prepared),
+            func.sum(MealStatsDB.plates_served),
+            func.count(MealStatsDB.id),
+        )
+        .group_by(MealStatsDB.day, MealStatsDB.meal)
+        .all()
+    )
+    db.query(MealStatsDailyDB).delete(synchronize_session=False)
+    db.add_all(
+        MealStatsDailyDB(
+            day=day,
+            meal=meal,
+            week_start=week_start(day),
+            month_start=month_start(day),
+            plates_prepared=prepared,
+            plates_served=served,
+            entries=entries,
+        )
+        for day, meal, prepared, served, entries in totals
+    )
+    db.commit()
+    return len(totals)
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def migrate_document_blobs(db: Session) -> int:
+    """Move documents uploaded before the blob store into it, deduplicating
+    identical files; returns documents moved.
+
+    Each file is linked (or copied) into blobs/ before its rows are
+    committed and the old file is removed only after, so an interruption
+    leaves at worst an orphan blob for GC and the row still on its old file.
+    """
+    moved = 0
+    for doc in db.query(DocumentDB).filter(DocumentDB.blob_sha256.is_(None)).all():
+        legacy = os.path.join(UPLOAD_DIR, doc.filename)
+        if not os.path.isfile(legacy):
+            continue  # nothing on disk to keep
+        sha256 = _hash_file(legacy)
+        path = blob_path(sha256)
+        target = os.path.join(UPLOAD_DIR, path)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            try:
+                os.link(legacy, target)
+            except OSError:
+                shutil.copyfile(legacy, target)
+
+        blob = db.get(DocumentBlobDB, sha256)
+        if blob is None:
+            db.add(DocumentBlobDB(
+                sha256=sha256,
+                size=os.path.getsize(target),
+                path=path,
+                ref_count=1,
+                created_at=datetime.utcnow(),
+            ))
+        else:
+            blob.ref_count += 1
+        doc.filename = path
+        doc.blob_sha256 = sha256
+        db.commit()
+        os.remove(legacy)
+        moved += 1
+    return moved
+
+
+def recount_room_occupancy(db: Session) -> int:
+    """Reset RoomDB.occupied from RoomAllocationDB; returns rooms corrected."""
+    counts = dict(
+        db.query(RoomAllocationDB.room_id, func.count(RoomAllocationDB.id))
+        .group_by(RoomAllocationDB.room_id)
+        .all()
+    )
+    fixed = 0
+    for room in db.query(RoomDB):
+        actual = counts.get(room.id, 0)
+        if room.occupied != actual:
+            room.occupied = actual
+            fixed += 1
+    db.commit()
+    return fixed
+
+
+def open_fee_ledger(db: Session) -> int:
+    """Give fee records that predate the ledger an opening entry for their balance."""
+    has_entries = (
+        db.query(FeeLedgerEntryDB.id)
+        .filter(FeeLedgerEntryDB.fee_record_id == FeeRecordDB.id)
+        .exists()
+    )
+    unopened = db.query(FeeRecordDB.id, FeeRecordDB.total_due).filter(~has_entries).all()
+    db.add_all(
+        FeeLedgerEntryDB(fee_record_id=record_id, kind="opening", amount=total_due)
+        for record_id, total_due in unopened
+    )
+    db.commit()
+    return len(unopened)
+
+
+def ensure_money_columns() -> None:
+    """Convert the old Float money columns to NUMERIC(12, 2) in place.
+
+    SQLite has no column types to change; Numeric converts its values on read.
+    """
+    engine = get_engine()
+    name = engine.dialect.name
+    if name not in {"postgresql", "mysql", "mariadb"}:
+        return
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table, column in (("fee_records", "total_due"), ("fee_payments", "amount")):
+            current = next(
+                c for c in inspector.get_columns(table) if c["name"] == column
+            )
+            if current["type"].python_type is not float:
+                continue
+            if name == "postgresql":
+                conn.execute(text(
+                    f"ALTER TABLE {table} ALTER COLUMN {column} TYPE NUMERIC(12, 2) "
+                    f"USING round({column}::numeric, 2)"
+                ))
+            else:
+                conn.execute(text(f"ALTER TABLE {table} MODIFY COLUMN {column} DECIMAL(12, 2) NOT NULL"))
+
+
+def ensure_columns() -> None:
+    """create_all skips tables that already exist, so add any new columns that
+    are nullable or have a server default."""
+    engine = get_engine()
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    continue
+                ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+
+
+def _keep_newest_per_day_meal(db: Session, model) -> int:
+    duplicated = (
+        db.query(model.day, model.meal)
+        .group_by(model.day, model.meal)
+        .having(func.count(model.id) > 1)
+        .all()
+    )
+    removed = 0
+    for day, meal in duplicated:
+        ids = [
+            row_id
+            for (row_id,) in db.query(model.id)
+            .filter(model.day == day, model.meal == meal)
+            .order_by(model.id.desc())
+        ]
+        removed += (
+            db.query(model)
+            .filter(model.id.in_(ids[1:]))
+            .delete(synchronize_session=False)
+        )
+    db.commit()
+    return removed
+
+
+def dedupe_daily_menus(db: Session) -> int:
+    """Keep the newest menu per (day, meal) so the unique index can be built."""
+    return _keep_newest_per_day_meal(db, DailyMenuDB)
+
+
+def dedupe_meal_stats(db: Session) -> int:
+    """Keep the newest stats per (day, meal) so the unique index can be built;
+    rebuild_meal_stats_daily then recomputes the rollup from what is left."""
+    return _keep_newest_per_day_meal(db, MealStatsDB)
+
+
+def ensure_indexes() -> None:
+    """create_all skips tables that already exist, so add any new indexes to them."""
+    engine = get_engine()
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def ensure_ticket_search() -> None:
+    """Create the full-text index for maintenance ticket search, if the backend has one."""
+    engine = get_engine()
+    name = engine.dialect.name
+    with engine.begin() as conn:
+        if name == "postgresql":
+            # must match the expression in app/routers/maintenance.py
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_maintenance_tickets_fts "
+                "ON maintenance_tickets USING gin "
+                "(to_tsvector('english', title || ' ' || description))"
+            ))
+        elif name == "sqlite":
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {TICKET_FTS_TABLE} USING fts5("
+                "title, description, content='maintenance_tickets', content_rowid='id')"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {TICKET_FTS_TABLE}_ai "
+                "AFTER INSERT ON maintenance_tickets BEGIN "
+                f"INSERT INTO {TICKET_FTS_TABLE}(rowid, title, description) "
+                "VALUES (new.id, new.title, new.description); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {TICKET_FTS_TABLE}_ad "
+                "AFTER DELETE ON maintenance_tickets BEGIN "
+                f"INSERT INTO {TICKET_FTS_TABLE}({TICKET_FTS_TABLE}, rowid, title, description) "
+                "VALUES ('delete', old.id, old.title, old.description); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {TICKET_FTS_TABLE}_au "
+                "AFTER UPDATE OF title, description ON maintenance_tickets BEGIN "
+                f"INSERT INTO {TICKET_FTS_TABLE}({TICKET_FTS_TABLE}, rowid, title, description) "
+                "VALUES ('delete', old.id, old.title, old.description); "
+                f"INSERT INTO {TICKET_FTS_TABLE}(rowid, title, description) "
+                "VALUES (new.id, new.title, new.description); END"
+            ))
+            # picks up tickets written before the triggers existed
+            conn.execute(text(f"INSERT INTO {TICKET_FTS_TABLE}({TICKET_FTS_TABLE}) VALUES ('rebuild')"))
+        elif name in {"mysql", "mariadb"}:
+            present = {i["name"] for i in inspect(conn).get_indexes("maintenance_tickets")}
+            if "ix_maintenance_tickets_fts" not in present:
+                conn.execute(text(
+                    "ALTER TABLE maintenance_tickets "
+                    "ADD FULLTEXT INDEX ix_maintenance_tickets_fts (title, description)"
+                ))
+
+
+def seed_users(db: Session) -> int:
+    """Insert the built-in accounts (fake_users_db) if they don't exist yet."""
+    existing = {username for (username,) in db.query(UserDB.username)}
+    added = 0
+    for seed in fake_users_db.values():
+        if seed["username"] not in existing:
+            db.add(UserDB(**seed))
+            added += 1
+    db.commit()
+    return added
+
+
+def run_all() -> None:
+    """Bootstrap/upgrade the schema and data. Run once per deploy, not per worker."""
+    Base.metadata.create_all(bind=get_engine())
+    ensure_columns()
+    ensure_money_columns()
+    ensure_ticket_search()
+    db = SessionLocal()
+    try:
+        dedupe_daily_menus(db)
+        dedupe_meal_stats(db)
+        ensure_indexes()
+        migrate_hostel_attendance(db)
+        migrate_meal_attendance(db)
+        rebuild_meal_stats_daily(db)
+        migrate_document_blobs(db)
+        recount_room_occupancy(db)
+        open_fee_ledger(db)
+        seed_users(db)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    run_all()
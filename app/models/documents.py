@@ -2,9 +2,27 @@ from datetime import datetime
 from typing import Optional
 
 from pydantic import BaseModel
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from app.database import Base
 
+UPLOAD_DIR = "uploaded_docs"
+
+
+def blob_path(sha256: str) -> str:
+    """Where a blob lives, relative to UPLOAD_DIR: blobs/<2 hex>/<2 hex>/<sha256>."""
+    return f"blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+class DocumentBlobDB(Base):
+    __tablename__ = "document_blobs"
+
+    # content-addressed: one row (and one file) per distinct upload content
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(Integer, nullable=False)
+    path = Column(String(500), nullable=False)  # relative to UPLOAD_DIR
+    ref_count = Column(Integer, nullable=False, default=0)  # DocumentDB rows pointing here
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
 
 class DocumentDB(Base):
     __tablename__ = "documents"
@@ -12,11 +30,19 @@ class DocumentDB(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     username = Column(String(255), index=True, nullable=False)
     doc_type = Column(String(100), nullable=False)
-    filename = Column(String(500), nullable=False)
+    filename = Column(String(500), nullable=False)  # blob path, relative to UPLOAD_DIR
+    original_filename = Column(String(255), nullable=True)  # as uploaded; null for old rows
     status = Column(String(50), nullable=False, default="pending")  # pending / verified / rejected
     uploaded_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     verified_at = Column(DateTime, nullable=True)
     comment = Column(String(1000), nullable=True)
+    # null for documents uploaded before the blob store existed
+    blob_sha256 = Column(String(64), ForeignKey("document_blobs.sha256"), nullable=True, index=True)
+
+    __table_args__ = (
+        # keyset pagination of a student's documents
+        Index("ix_documents_username_uploaded_at_id", "username", "uploaded_at", "id"),
+    )
 
 
 class Document(BaseModel):
@@ -24,10 +50,12 @@ class Document(BaseModel):
     username: str
     doc_type: str
     filename: str
+    original_filename: Optional[str] = None
     status: str = "pending"
     uploaded_at: datetime
     verified_at: Optional[datetime] = None
     comment: Optional[str] = None
+    sha256: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -36,3 +64,9 @@ class Document(BaseModel):
 class VerifyRequest(BaseModel):
     status: str  # "verified" or "rejected"
     comment: Optional[str] = None
+
+
+class BlobGCResult(BaseModel):
+    blobs_removed: int
+    bytes_freed: int
+    orphan_files_removed: int = 0  # files under blobs/ with no document_blobs row
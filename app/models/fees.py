@@ -1,8 +1,9 @@
 from datetime import datetime
-from typing import List
+from decimal import Decimal
+from typing import List, Optional
 
-from pydantic import BaseModel
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from pydantic import BaseModel, Field
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from app.database import Base
@@ -13,7 +14,10 @@ class FeeRecordDB(Base):
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     username = Column(String(255), index=True, nullable=False, unique=True)
-    total_due = Column(Float, nullable=False, default=0.0)
+    # materialized sum of this record's FeeLedgerEntryDB amounts; only ever
+    # changed by UPDATE ... SET total_due = total_due + :delta. Negative
+    # means the student is in credit.
+    total_due = Column(Numeric(12, 2), nullable=False, default=Decimal("0"))
 
     payments = relationship("PaymentDB", back_populates="fee_record", cascade="all, delete-orphan")
 
@@ -23,12 +27,29 @@ class PaymentDB(Base):
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     fee_record_id = Column(Integer, ForeignKey("fee_records.id"), nullable=False, index=True)
-    amount = Column(Float, nullable=False)
+    amount = Column(Numeric(12, 2), nullable=False)
     timestamp = Column(DateTime, nullable=False, default=datetime.utcnow)
 
     fee_record = relationship("FeeRecordDB", back_populates="payments")
 
 
+class FeeLedgerEntryDB(Base):
+    __tablename__ = "fee_ledger"
+
+    # append-only: rows are never updated or deleted
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    fee_record_id = Column(Integer, ForeignKey("fee_records.id"), nullable=False)
+    kind = Column(String(20), nullable=False)  # opening / charge / adjustment / payment
+    amount = Column(Numeric(12, 2), nullable=False)  # signed: payments are negative
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    created_by = Column(String(255), nullable=True)
+
+    __table_args__ = (
+        # one student's history in order, and the per-record sums of a rebuild
+        Index("ix_fee_ledger_record_id", "fee_record_id", "id"),
+    )
+
+
 # ---------- Pydantic schemas ----------
 
 class Payment(BaseModel):
@@ -48,11 +69,52 @@ class FeeRecord(BaseModel):
         from_attributes = True
 
 
+# money comes in as exact decimals (at most 2 places) and goes out as JSON
+# numbers, which is what the pages do arithmetic on
+
 class SetDueRequest(BaseModel):
     username: str
-    amount: float
+    amount: Decimal = Field(ge=0, max_digits=12, decimal_places=2)
 
 
 class PayRequest(BaseModel):
     username: str
+    amount: Decimal = Field(gt=0, max_digits=12, decimal_places=2)
+
+
+class ChargeRequest(BaseModel):
+    username: str
+    amount: Decimal = Field(gt=0, max_digits=12, decimal_places=2)
+
+
+class LedgerEntry(BaseModel):
+    kind: str
     amount: float
+    created_at: datetime
+    created_by: Optional[str] = None
+
+
+class LedgerRebuildResult(BaseModel):
+    records: int
+    corrected: int
+
+
+class FeeSummary(BaseModel):
+    students: int
+    total_outstanding: float
+    total_collected: float
+    defaulters: int  # students with total_due > 0
+
+
+class FeeImportError(BaseModel):
+    line: int
+    username: Optional[str] = None
+    error: str
+
+
+class FeeImportResult(BaseModel):
+    kind: str  # dues or payments
+    rows: int
+    imported: int
+    failed: int
+    errors: List[FeeImportError]  # the first MAX_IMPORT_ERRORS only
@@ -1,8 +1,8 @@
 from datetime import datetime, date
-from typing import List
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel
-from sqlalchemy import Column, Integer, String, Date, DateTime
+from sqlalchemy import Column, Integer, String, Date, DateTime, Index
 from app.database import Base
 
 
@@ -18,6 +18,18 @@ class GatePassDB(Base):
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     decided_at = Column(DateTime, nullable=True)
 
+    __table_args__ = (
+        # keyset pagination of the admin and per-student lists
+        Index("ix_gatepasses_created_at_id", "created_at", "id"),
+        Index("ix_gatepasses_student_created_at_id", "student_username", "created_at", "id"),
+        # "who is out on X": passes with status S and to_date >= X, from_date
+        # checked in the index. to_date leads because past passes all end
+        # before today, so the range stays small as history grows.
+        Index("ix_gatepasses_status_to_from", "status", "to_date", "from_date"),
+        # overlap check when a student creates a pass
+        Index("ix_gatepasses_student_to_from", "student_username", "to_date", "from_date"),
+    )
+
 
 # ---------- Pydantic schemas ----------
 
@@ -43,3 +55,21 @@ class CreateGatePassRequest(BaseModel):
 
 class DecisionRequest(BaseModel):
     status: str  # approved or rejected
+
+
+class BulkDecisionRequest(BaseModel):
+    status: str  # approved or rejected
+    # pending passes to decide: these ids, and/or those starting in a range
+    ids: Optional[List[int]] = None
+    from_date: Optional[date] = None
+    to_date: Optional[date] = None
+
+
+class BulkDecisionResult(BaseModel):
+    updated: int
+    passes: List[GatePass]
+
+
+class GatePassSummary(BaseModel):
+    total: int
+    by_status: Dict[str, int]  # pending / approved / rejected -> passes
@@ -2,7 +2,7 @@ from datetime import date
 from typing import List, Set
 
 from pydantic import BaseModel
-from sqlalchemy import Column, Integer, String, Date
+from sqlalchemy import Column, Integer, String, Date, Index, UniqueConstraint
 from app.database import Base
 
 
@@ -11,7 +11,24 @@ class HostelAttendanceDB(Base):
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     day = Column(Date, nullable=False, index=True)
-    present_usernames = Column(String(2000), nullable=False, default="")  # comma-separated usernames
+    # legacy: comma-separated usernames, superseded by HostelAttendanceEntryDB.
+    # Kept only so old rows can be migrated (see app/migrations.py).
+    present_usernames = Column(String(2000), nullable=False, default="")
+
+
+class HostelAttendanceEntryDB(Base):
+    __tablename__ = "hostel_attendance_entries"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    day = Column(Date, nullable=False)
+    username = Column(String(255), nullable=False)
+
+    __table_args__ = (
+        # one row per student per day; also serves "who was present on day X"
+        UniqueConstraint("day", "username", name="uq_hostel_attendance_day_username"),
+        # serves "which days was student X present"
+        Index("ix_hostel_attendance_username_day", "username", "day"),
+    )
 
 
 class HostelAttendance(BaseModel):
@@ -26,3 +43,20 @@ class MarkRequest(BaseModel):
     day: date
     username: str
     present: bool
+
+
+class RollCallRequest(BaseModel):
+    day: date
+    present: List[str] = []
+    absent: List[str] = []
+
+
+class RollCallResult(BaseModel):
+    username: str
+    present: bool
+    result: str  # added / removed / unchanged
+
+
+class RollCallResponse(BaseModel):
+    day: date
+    results: List[RollCallResult]
@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
 
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index
 from app.database import Base
 from pydantic import BaseModel
 
@@ -20,6 +20,21 @@ class MaintenanceTicketDB(Base):
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 
+    __table_args__ = (
+        # keyset pagination of the admin and per-student lists
+        Index("ix_maintenance_tickets_created_at_id", "created_at", "id"),
+        Index("ix_maintenance_tickets_created_by_created_at_id", "created_by", "created_at", "id"),
+        # search filters; the full-text index is dialect-specific and is
+        # created by app/migrations.py (ensure_ticket_search)
+        Index("ix_maintenance_tickets_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_maintenance_tickets_room_status", "room_number", "status"),
+    )
+
+
+# FTS5 table mirroring title/description on SQLite (external content, kept
+# in sync by triggers)
+TICKET_FTS_TABLE = "maintenance_tickets_fts"
+
 
 # ---------- Pydantic schemas ----------
 
@@ -51,3 +66,8 @@ class TicketRead(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class TicketSummary(BaseModel):
+    total: int
+    by_status: Dict[str, int]  # open / in_progress / closed -> tickets
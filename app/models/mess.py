@@ -1,8 +1,8 @@
-from datetime import date
-from typing import List, Set
+from datetime import date, timedelta
+from typing import List, Optional, Set
 
 from pydantic import BaseModel
-from sqlalchemy import Column, Integer, String, Date, Table, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, Table, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from app.database import Base
@@ -20,6 +20,11 @@ class DailyMenuDB(Base):
     meal = Column(String(50), nullable=False, index=True)
     items = Column(String(2000), nullable=False)  # comma-separated list
 
+    __table_args__ = (
+        # one menu per meal per day; the conflict target for bulk upserts
+        Index("uq_daily_menus_day_meal", "day", "meal", unique=True),
+    )
+
 
 class MealAttendanceDB(Base):
     __tablename__ = "meal_attendance"
@@ -27,7 +32,38 @@ class MealAttendanceDB(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     day = Column(Date, nullable=False, index=True)
     meal = Column(String(50), nullable=False, index=True)
-    attendees = Column(String(2000), nullable=False, default="")  # comma-separated usernames
+    # legacy: comma-separated usernames, superseded by MealAttendanceEntryDB.
+    # Kept only so old rows can be migrated (see app/migrations.py).
+    attendees = Column(String(2000), nullable=False, default="")
+
+
+class MealAttendanceEntryDB(Base):
+    __tablename__ = "meal_attendance_entries"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    day = Column(Date, nullable=False)
+    meal = Column(String(50), nullable=False)
+    username = Column(String(255), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("day", "meal", "username", name="uq_meal_attendance_day_meal_username"),
+        # serves a student's history, filtered by day or date range
+        Index("ix_meal_attendance_username_day", "username", "day"),
+    )
+
+
+class MealHeadcountDB(Base):
+    __tablename__ = "meal_headcounts"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    day = Column(Date, nullable=False)
+    meal = Column(String(50), nullable=False)
+    # maintained alongside MealAttendanceEntryDB inserts/deletes
+    headcount = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("day", "meal", name="uq_meal_headcount_day_meal"),
+    )
 
 
 class MealStatsDB(Base):
@@ -39,6 +75,40 @@ class MealStatsDB(Base):
     plates_prepared = Column(Integer, nullable=False)
     plates_served = Column(Integer, nullable=False)
 
+    __table_args__ = (
+        # one row per meal per day; the conflict target for set_stats
+        Index("uq_meal_stats_day_meal", "day", "meal", unique=True),
+    )
+
+
+class MealStatsDailyDB(Base):
+    __tablename__ = "meal_stats_daily"
+    # rollup of MealStatsDB, maintained alongside set_stats; the bucket
+    # columns let analytics GROUP BY week/month without dialect date functions
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    day = Column(Date, nullable=False)
+    meal = Column(String(50), nullable=False)
+    week_start = Column(Date, nullable=False)
+    month_start = Column(Date, nullable=False)
+    plates_prepared = Column(Integer, nullable=False, default=0)
+    plates_served = Column(Integer, nullable=False, default=0)
+    entries = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("day", "meal", name="uq_meal_stats_daily_day_meal"),
+        # serves one meal's trend over a date range
+        Index("ix_meal_stats_daily_meal_day", "meal", "day"),
+    )
+
+
+def week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
 
 # ---------- Pydantic schemas ----------
 
@@ -60,6 +130,15 @@ class MealAttendance(BaseModel):
         from_attributes = True
 
 
+class MealHeadcount(BaseModel):
+    day: date
+    meal: str
+    headcount: int
+
+    class Config:
+        from_attributes = True
+
+
 class MealStats(BaseModel):
     day: date
     meal: str
@@ -76,6 +155,29 @@ class MenuSetRequest(BaseModel):
     items: List[str]
 
 
+class MenuBulkRequest(BaseModel):
+    entries: List[MenuSetRequest]
+
+
+class MenuBulkResult(BaseModel):
+    upserted: int
+    from_date: Optional[date] = None
+    to_date: Optional[date] = None
+
+
+class WastageBucket(BaseModel):
+    period_start: date
+    meal: str
+    days: int
+    plates_prepared: int
+    plates_served: int
+    plates_wasted: int
+    waste_ratio: float
+    avg_plates_served: float
+    # change in waste_ratio from this meal's previous bucket in the range
+    waste_ratio_change: Optional[float] = None
+
+
 class StatsSetRequest(BaseModel):
     day: date
     meal: str
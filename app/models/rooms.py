@@ -1,6 +1,7 @@
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from app.database import Base
@@ -17,8 +18,31 @@ class RoomDB(Base):
     block = Column(String(50), nullable=False)
     capacity = Column(Integer, nullable=False)
     room_type = Column(String(50), nullable=False, default="normal")
-    # For now, store occupants count or handle occupants in a separate table later.
-    # Here we just keep capacity; occupancy will be calculated from allocations table later.
+    # maintained alongside RoomAllocationDB inserts/deletes; only ever changed
+    # by a conditional UPDATE so it can't pass capacity
+    occupied = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        # "rooms with free beds in block X of type Y": an index range scan on
+        # (block, room_type), with capacity > occupied checked inside the index
+        Index("ix_rooms_block_type_vacancy", "block", "room_type", "occupied", "capacity"),
+    )
+
+
+class RoomAllocationDB(Base):
+    __tablename__ = "room_allocations"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    room_id = Column(Integer, ForeignKey("rooms.id"), nullable=False, index=True)
+    username = Column(String(255), nullable=False)
+    allocated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    room = relationship("RoomDB")
+
+    __table_args__ = (
+        # a student holds at most one bed
+        UniqueConstraint("username", name="uq_room_allocations_username"),
+    )
 
 
 # ---------- Pydantic schemas (request/response) ----------
@@ -36,18 +60,53 @@ class RoomCreate(RoomBase):
 
 class RoomRead(RoomBase):
     id: int
+    occupied: int = 0
 
     @computed_field
     @property
     def vacant_beds(self) -> int:
-        # For now assume 0 occupants; later link to allocations.
-        return self.capacity
+        return max(self.capacity - self.occupied, 0)
 
     @computed_field
     @property
     def status(self) -> str:
-        # With real occupants this will change; for now everything is vacant.
-        return "vacant"
+        if self.occupied >= self.capacity:
+            return "full"
+        return "partially_occupied" if self.occupied else "vacant"
 
     class Config:
         from_attributes = True  # allow creating from SQLAlchemy model
+
+
+class RoomAllocation(BaseModel):
+    username: str
+    room_number: str
+    allocated_at: datetime
+
+
+class StudentRoomPreference(BaseModel):
+    username: str
+    block: Optional[str] = None
+    room_type: Optional[str] = None
+    roommates: List[str] = []
+
+
+class BulkAllocateRequest(BaseModel):
+    students: List[StudentRoomPreference]
+    dry_run: bool = False
+
+
+class PlannedAllocation(BaseModel):
+    username: str
+    room_number: str
+
+
+class UnplacedStudent(BaseModel):
+    username: str
+    reason: str
+
+
+class BulkAllocateResult(BaseModel):
+    dry_run: bool
+    placed: List[PlannedAllocation]
+    unplaced: List[UnplacedStudent]
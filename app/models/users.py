@@ -1,3 +1,26 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+from sqlalchemy import Boolean, Column, DateTime, Integer, String
+
+from app.database import Base
+
+
+class UserDB(Base):
+    __tablename__ = "users"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    username = Column(String(255), unique=True, index=True, nullable=False)
+    full_name = Column(String(255), nullable=True)
+    role = Column(String(50), nullable=False, default="student")  # student / admin
+    hashed_password = Column(String(255), nullable=False)
+    disabled = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+# seed accounts, inserted by app/migrations.py when missing
 fake_users_db = {
     "admin": {
         "username": "admin",
@@ -14,3 +37,30 @@ fake_users_db = {
         "disabled": False,
     },
 }
+
+
+# ---------- Pydantic schemas ----------
+
+class UserRead(BaseModel):
+    id: int
+    username: str
+    full_name: Optional[str] = None
+    role: str
+    disabled: bool = False
+
+    class Config:
+        from_attributes = True
+
+
+class UserCreate(BaseModel):
+    username: str
+    password: str
+    full_name: Optional[str] = None
+    role: str = "student"
+
+
+class UserUpdate(BaseModel):
+    full_name: Optional[str] = None
+    role: Optional[str] = None
+    disabled: Optional[bool] = None
+    password: Optional[str] = None
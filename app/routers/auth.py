@@ -3,14 +3,16 @@ from datetime import timedelta
 from fastapi import APIRouter, HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordRequestForm  # <-- add this
 from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.security import (
     verify_password,
     create_access_token,
     ACCESS_TOKEN_EXPIRE_MINUTES,
-    get_current_user,
 )
-from app.models.users import fake_users_db
+from app.dependencies import get_current_user, get_db
+from app.models.users import UserDB
 
 
 class TokenResponse(BaseModel):
@@ -23,22 +25,30 @@ router = APIRouter(prefix="/api", tags=["auth"])
 
 
 @router.post("/login", response_model=TokenResponse)
-def login(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_db),
+):
     username = form_data.username
     password = form_data.password
 
-    user = fake_users_db.get(username)
-    if not user or not verify_password(password, user["hashed_password"]):
+    user = await db.scalar(select(UserDB).where(UserDB.username == username))
+    if not user or not verify_password(password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password",
         )
+    if user.disabled:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User is disabled",
+        )
 
     access_token = create_access_token(
-        data={"sub": user["username"], "role": user["role"]},
+        data={"sub": user.username, "role": user.role},
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
     )
-    return TokenResponse(access_token=access_token, role=user["role"])
+    return TokenResponse(access_token=access_token, role=user.role)
 
 
 @router.get("/me")
@@ -1,16 +1,30 @@
 from datetime import datetime
-from typing import List
+from typing import List, Tuple
 
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Form
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Form, Response
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
+import re
 
-from app.dependencies import get_db
-from app.models.documents import DocumentDB, Document, VerifyRequest
+from app.core.bulk import insert_ignore
+from app.core.events import broker
+from app.core.pagination import PageParams, paginate
+from app.core.storage import StagedUpload, commit_upload, discard_upload, list_files, remove_file, stage_upload
+from app.dependencies import get_db, get_read_db
+from app.models.documents import (
+    UPLOAD_DIR,
+    BlobGCResult,
+    Document,
+    DocumentBlobDB,
+    DocumentDB,
+    VerifyRequest,
+    blob_path,
+)
 from app.routers.auth import get_current_user  # real auth
 
-UPLOAD_DIR = "uploaded_docs"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+ORPHAN_CHECK_BATCH = 500
+SHA256_RE = re.compile(r"[0-9a-f]{64}")
 
 router = APIRouter(prefix="/api/documents", tags=["documents"])
 
@@ -23,13 +37,122 @@ def _to_schema(d: DocumentDB) -> Document:
         username=d.username,
         doc_type=d.doc_type,
         filename=d.filename,
+        original_filename=d.original_filename,
         status=d.status,
         uploaded_at=d.uploaded_at,
         verified_at=d.verified_at,
         comment=d.comment,
+        sha256=d.blob_sha256,
     )
 
 
+# ---- blob store ----
+#
+# Uploads are stored once per distinct content under
+# UPLOAD_DIR/blobs/<2 hex>/<2 hex>/<sha256>; DocumentDB rows reference them
+# and document_blobs.ref_count tracks how many do.
+
+async def _add_blob_ref(db: AsyncSession, sha256: str, delta: int) -> bool:
+    # atomic in SQL so concurrent uploads of the same file count correctly
+    result = await db.execute(
+        update(DocumentBlobDB)
+        .where(DocumentBlobDB.sha256 == sha256)
+        .values(ref_count=DocumentBlobDB.ref_count + delta)
+    )
+    return result.rowcount > 0
+
+
+async def _store_blob(db: AsyncSession, staged: StagedUpload) -> str:
+    """Take a reference to the blob for the staged content, writing it only if new."""
+    path = blob_path(staged.sha256)
+    if await _add_blob_ref(db, staged.sha256, 1):
+        # duplicate upload: the bytes are already on disk
+        await discard_upload(staged)
+        return path
+
+    # row first, file second: the file only appears once this transaction
+    # holds the row, so collect_blob_garbage can't mistake it for an orphan
+    # while we're still running. If we fail after the rename, the rollback
+    # leaves a file without a row, which the next GC removes.
+    await insert_ignore(
+        db,
+        DocumentBlobDB,
+        [{
+            "sha256": staged.sha256,
+            "size": staged.size,
+            "path": path,
+            "ref_count": 0,
+            "created_at": datetime.utcnow(),
+        }],
+    )
+    await _add_blob_ref(db, staged.sha256, 1)
+    # identical content, so losing a race with another writer here is harmless
+    await commit_upload(staged, os.path.join(UPLOAD_DIR, path))
+    return path
+
+
+async def _remove_orphan_files(db: AsyncSession) -> Tuple[int, int]:
+    # files under blobs/ whose row never committed (an upload that failed
+    # after moving its file into place)
+    files = {}
+    for path, size in await list_files(os.path.join(UPLOAD_DIR, "blobs")):
+        name = os.path.basename(path)
+        if SHA256_RE.fullmatch(name):
+            files[name] = (path, size)
+    names = list(files)
+    known = set()
+    for start in range(0, len(names), ORPHAN_CHECK_BATCH):
+        batch = names[start:start + ORPHAN_CHECK_BATCH]
+        known.update(await db.scalars(select(DocumentBlobDB.sha256).where(DocumentBlobDB.sha256.in_(batch))))
+
+    removed = 0
+    freed = 0
+    for sha256 in names:
+        if sha256 in known:
+            continue
+        path, size = files[sha256]
+        # claim the key like an upload would: this waits for an in-flight
+        # upload of the same content, and fails if it committed meanwhile
+        claimed = await insert_ignore(
+            db,
+            DocumentBlobDB,
+            [{"sha256": sha256, "size": size, "path": blob_path(sha256), "ref_count": 0, "created_at": datetime.utcnow()}],
+        )
+        if claimed:
+            await db.execute(
+                delete(DocumentBlobDB)
+                .where(DocumentBlobDB.sha256 == sha256)
+                .execution_options(synchronize_session=False)
+            )
+            await remove_file(path)
+            removed += 1
+            freed += size
+    return removed, freed
+
+
+async def collect_blob_garbage(db: AsyncSession) -> BlobGCResult:
+    """Delete blobs no document references any more, rows and files, and
+    files left behind without a row."""
+    result = await db.execute(select(DocumentBlobDB).where(DocumentBlobDB.ref_count <= 0))
+    removed = 0
+    freed = 0
+    for blob in result.scalars().all():
+        gone = await db.execute(
+            delete(DocumentBlobDB)
+            .where(DocumentBlobDB.sha256 == blob.sha256, DocumentBlobDB.ref_count <= 0)
+            .execution_options(synchronize_session=False)
+        )
+        if gone.rowcount:
+            # unlink before commit: a concurrent upload of the same content
+            # blocks on this row and only re-creates the file after we commit
+            await remove_file(os.path.join(UPLOAD_DIR, blob.path))
+            removed += 1
+            freed += blob.size
+    orphans, orphan_bytes = await _remove_orphan_files(db)
+    await db.commit()
+    return BlobGCResult(blobs_removed=removed, bytes_freed=freed + orphan_bytes, orphan_files_removed=orphans)
+
+
 # ---- endpoints ----
 
 @router.post("/upload", response_model=Document)
@@ -37,73 +160,72 @@ async def upload_document(
     doc_type: str = Form(...),
     file: UploadFile = File(...),
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     # students upload their own documents
     if user["role"] != "student":
         raise HTTPException(status_code=403, detail="Only students can upload documents")
 
-    ext = os.path.splitext(file.filename)[1]
-    saved_name = f"{user['username']}_{int(datetime.utcnow().timestamp())}{ext}"
-    full_path = os.path.join(UPLOAD_DIR, saved_name)
-    with open(full_path, "wb") as f:
-        f.write(await file.read())
+    staged = await stage_upload(file, UPLOAD_DIR)
+    try:
+        path = await _store_blob(db, staged)
+    except BaseException:
+        await discard_upload(staged)
+        raise
 
     doc_db = DocumentDB(
         username=user["username"],
         doc_type=doc_type,
-        filename=saved_name,
+        filename=path,
+        original_filename=os.path.basename(file.filename or "")[:255] or None,
         status="pending",
         uploaded_at=datetime.utcnow(),
+        blob_sha256=staged.sha256,
     )
     db.add(doc_db)
-    db.commit()
-    db.refresh(doc_db)
+    await db.commit()
+    await db.refresh(doc_db)
 
     return _to_schema(doc_db)
 
 
 @router.get("/my", response_model=List[Document])
-def my_documents(
+async def my_documents(
+    response: Response,
+    page: PageParams = Depends(),
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     if user["role"] != "student":
         raise HTTPException(status_code=403, detail="Only students can view their documents")
 
-    rows = (
-        db.query(DocumentDB)
-        .filter(DocumentDB.username == user["username"])
-        .order_by(DocumentDB.uploaded_at.desc())
-        .all()
-    )
+    stmt = select(DocumentDB).where(DocumentDB.username == user["username"])
+    rows = await paginate(db, stmt, [DocumentDB.uploaded_at, DocumentDB.id], page, response, descending=True)
     return [_to_schema(r) for r in rows]
 
 
 @router.get("/by-user/{username}", response_model=List[Document])
-def documents_by_user(
+async def documents_by_user(
     username: str,
+    response: Response,
+    page: PageParams = Depends(),
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     if user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Only admin can view documents")
 
-    rows = (
-        db.query(DocumentDB)
-        .filter(DocumentDB.username == username)
-        .order_by(DocumentDB.uploaded_at.desc())
-        .all()
-    )
+    stmt = select(DocumentDB).where(DocumentDB.username == username)
+    rows = await paginate(db, stmt, [DocumentDB.uploaded_at, DocumentDB.id], page, response, descending=True)
     return [_to_schema(r) for r in rows]
 
 
 @router.post("/{doc_id}/verify", response_model=Document)
-def verify_document(
+async def verify_document(
     doc_id: int,
     req: VerifyRequest,
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     if user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Only admin can verify documents")
@@ -111,7 +233,7 @@ def verify_document(
     if req.status not in {"verified", "rejected"}:
         raise HTTPException(status_code=400, detail="Invalid status")
 
-    doc_db = db.query(DocumentDB).filter(DocumentDB.id == doc_id).first()
+    doc_db = await db.get(DocumentDB, doc_id)
     if doc_db is None:
         raise HTTPException(status_code=404, detail="Document not found")
 
@@ -119,7 +241,50 @@ def verify_document(
     doc_db.comment = req.comment
     doc_db.verified_at = datetime.utcnow()
 
-    db.commit()
-    db.refresh(doc_db)
+    await db.commit()
+    await db.refresh(doc_db)
 
-    return _to_schema(doc_db)
+    result = _to_schema(doc_db)
+    broker.publish(doc_db.username, "document", result.model_dump(mode="json"))
+    return result
+
+
+@router.delete("/{doc_id}")
+async def delete_document(
+    doc_id: int,
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    doc_db = await db.get(DocumentDB, doc_id)
+    if doc_db is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    # students may withdraw their own pending uploads; admin may delete any
+    if user["role"] != "admin":
+        if doc_db.username != user["username"] or doc_db.status != "pending":
+            raise HTTPException(status_code=403, detail="Not allowed")
+
+    legacy_file = None
+    if doc_db.blob_sha256 is not None:
+        await _add_blob_ref(db, doc_db.blob_sha256, -1)
+    else:
+        # not yet moved into the blob store by migrate_document_blobs, so
+        # no other row shares the file and GC would never find it
+        legacy_file = os.path.join(UPLOAD_DIR, doc_db.filename)
+    await db.delete(doc_db)
+    await db.commit()
+    if legacy_file is not None:
+        await remove_file(legacy_file)
+
+    return {"detail": "Document deleted"}
+
+
+@router.post("/blobs/gc", response_model=BlobGCResult)
+async def garbage_collect_blobs(
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can collect document blobs")
+
+    return await collect_blob_garbage(db)
@@ -0,0 +1,60 @@
+import asyncio
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.core.events import broker
+from app.database import AsyncSessionLocal, get_async_engine
+from app.dependencies import resolve_user
+
+router = APIRouter(prefix="/api/events", tags=["events"])
+
+KEEPALIVE_SECONDS = 15
+
+
+async def _stream(request: Request, username: str):
+    queue = broker.subscribe(username)
+    try:
+        # reconnect delay for EventSource
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                event, data = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                # comment line: keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+    finally:
+        broker.unsubscribe(username, queue)
+
+
+@router.get("/")
+async def event_stream(
+    request: Request,
+    access_token: Optional[str] = Query(None),
+    authorization: Optional[str] = Header(None),
+):
+    # Server-Sent Events: gatepass, ticket and document changes for the
+    # current user. EventSource can't send headers, so the token may also
+    # come as ?access_token=.
+    token = access_token
+    if authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    # short-lived session: the stream itself must not pin a pooled connection
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        user = await resolve_user(token, db)
+
+    return StreamingResponse(
+        _stream(request, user["username"]),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
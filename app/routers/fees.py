@@ -1,23 +1,41 @@
-from datetime import datetime
-from typing import List
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile
+from sqlalchemy import bindparam, case, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
-from app.dependencies import get_db
+from app.core.bulk import insert_ignore
+from app.core.csvstream import CsvRow, iter_csv_batches
+from app.core.export import export_response
+from app.core.pagination import PageParams, paginate
+from app.dependencies import get_db, get_read_db
 from app.models.fees import (
+    FeeLedgerEntryDB,
     FeeRecordDB,
     PaymentDB,
+    ChargeRequest,
+    FeeImportError,
+    FeeImportResult,
     FeeRecord,
+    FeeSummary,
+    LedgerEntry,
+    LedgerRebuildResult,
     Payment,
     SetDueRequest,
     PayRequest,
 )
+from app.models.users import UserDB
 from app.routers.auth import get_current_user  # <-- real auth
 
 
 router = APIRouter(prefix="/api/fees", tags=["fees"])
 
+IMPORT_BATCH = 500
+MAX_IMPORT_ERRORS = 1000
+
 
 # ---- helpers ----
 
@@ -29,95 +47,354 @@ def _to_fee_record_schema(record: FeeRecordDB) -> FeeRecord:
     return FeeRecord(username=record.username, total_due=record.total_due, payments=payments)
 
 
+async def _get_record(db: AsyncSession, username: str) -> FeeRecordDB | None:
+    # payments are loaded up front; lazy loading is not available under asyncio.
+    # populate_existing: total_due is changed by SQL UPDATEs, not on the object
+    return await db.scalar(
+        select(FeeRecordDB)
+        .where(FeeRecordDB.username == username)
+        .options(selectinload(FeeRecordDB.payments))
+        .execution_options(populate_existing=True)
+    )
+
+
+async def _record_id(db: AsyncSession, username: str) -> int:
+    # insert-or-ignore, so two first payments for a student can't collide
+    await insert_ignore(db, FeeRecordDB, [{"username": username, "total_due": Decimal("0")}])
+    return await db.scalar(select(FeeRecordDB.id).where(FeeRecordDB.username == username))
+
+
+async def _post(db: AsyncSession, record_id: int, kind: str, amount: Decimal, by: str) -> None:
+    """Append a ledger entry and apply it to the balance in the same transaction."""
+    db.add(FeeLedgerEntryDB(fee_record_id=record_id, kind=kind, amount=amount, created_by=by))
+    # relative UPDATE: concurrent postings serialize on the row, none is lost
+    await db.execute(
+        update(FeeRecordDB)
+        .where(FeeRecordDB.id == record_id)
+        .values(total_due=FeeRecordDB.total_due + amount)
+    )
+
+
+async def _respond(db: AsyncSession, username: str) -> FeeRecord:
+    record = await _get_record(db, username)
+    return _to_fee_record_schema(record)
+
+
+def _parse_amount(raw: Optional[str], allow_zero: bool) -> Decimal:
+    try:
+        amount = Decimal((raw or "").strip())
+    except InvalidOperation:
+        raise ValueError("Invalid amount")
+    if not amount.is_finite() or amount.as_tuple().exponent < -2:
+        raise ValueError("Amount must have at most 2 decimal places")
+    if amount < 0 or (amount == 0 and not allow_zero):
+        raise ValueError("Amount must be positive" if not allow_zero else "Amount must not be negative")
+    if amount >= Decimal("1e10"):
+        raise ValueError("Amount too large")
+    return amount
+
+
+async def _import_batch(
+    db: AsyncSession, kind: str, batch: List[CsvRow], by: str, errors: List[FeeImportError]
+) -> int:
+    """Validate and apply one batch of CSV rows; returns how many were imported."""
+    valid = []
+    for line, row in batch:
+        username = (row.get("username") or "").strip()
+        try:
+            if not username:
+                raise ValueError("Missing username")
+            valid.append((line, username, _parse_amount(row.get("amount"), kind == "dues")))
+        except ValueError as e:
+            errors.append(FeeImportError(line=line, username=username or None, error=str(e)))
+
+    known = set()
+    if valid:
+        result = await db.execute(
+            select(UserDB.username).where(UserDB.username.in_({u for _, u, _ in valid}))
+        )
+        known.update(result.scalars())
+    rows = []
+    for line, username, amount in valid:
+        if username in known:
+            rows.append((username, amount))
+        else:
+            errors.append(FeeImportError(line=line, username=username, error="Unknown user"))
+    if not rows:
+        return 0
+
+    names = {username for username, _ in rows}
+    await insert_ignore(
+        db, FeeRecordDB, [{"username": n, "total_due": Decimal("0")} for n in sorted(names)]
+    )
+    result = await db.execute(
+        select(FeeRecordDB.id, FeeRecordDB.username, FeeRecordDB.total_due)
+        .where(FeeRecordDB.username.in_(names))
+        .with_for_update()
+    )
+    records = {username: (record_id, total_due) for record_id, username, total_due in result.all()}
+
+    now = datetime.utcnow()
+    entries = []
+    delta: Dict[int, Decimal] = {}
+    if kind == "payments":
+        # every payment is its own entry; a student may appear many times
+        payments = []
+        for username, amount in rows:
+            record_id = records[username][0]
+            payments.append({"fee_record_id": record_id, "amount": amount, "timestamp": now})
+            entries.append({"fee_record_id": record_id, "kind": "payment", "amount": -amount,
+                            "created_at": now, "created_by": by})
+            delta[record_id] = delta.get(record_id, Decimal("0")) - amount
+        await db.execute(insert(PaymentDB), payments)
+    else:
+        # dues set the balance like /set-due; the last row for a student wins
+        target = {username: amount for username, amount in rows}
+        for username, amount in target.items():
+            record_id, current = records[username]
+            if amount != current:
+                entries.append({"fee_record_id": record_id, "kind": "adjustment",
+                                "amount": amount - current, "created_at": now, "created_by": by})
+                delta[record_id] = amount - current
+
+    if entries:
+        await db.execute(insert(FeeLedgerEntryDB), entries)
+    if delta:
+        # one executemany of relative updates, same as _post
+        table = FeeRecordDB.__table__
+        await db.execute(
+            update(table)
+            .where(table.c.id == bindparam("record_id"))
+            .values(total_due=table.c.total_due + bindparam("delta")),
+            [{"record_id": record_id, "delta": d} for record_id, d in delta.items()],
+        )
+    return len(rows)
+
+
 # ---- endpoints ----
 
 @router.post("/set-due", response_model=FeeRecord)
-def set_due(
+async def set_due(
     req: SetDueRequest,
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     # admin sets or updates hostel fee due for a student
     if user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Only admin can set dues")
 
-    record = (
-        db.query(FeeRecordDB)
-        .filter(FeeRecordDB.username == req.username)
-        .first()
+    record_id = await _record_id(db, req.username)
+    # "set" is relative to the current balance, so hold the row while the
+    # difference is worked out
+    current = await db.scalar(
+        select(FeeRecordDB.total_due).where(FeeRecordDB.id == record_id).with_for_update()
     )
-    if record is None:
-        record = FeeRecordDB(username=req.username, total_due=req.amount)
-        db.add(record)
-    else:
-        record.total_due = req.amount
+    delta = req.amount - current
+    if delta:
+        await _post(db, record_id, "adjustment", delta, user["username"])
+    await db.commit()
 
-    db.commit()
-    db.refresh(record)
+    return await _respond(db, req.username)
 
-    return _to_fee_record_schema(record)
+
+@router.post("/charge", response_model=FeeRecord)
+async def add_charge(
+    req: ChargeRequest,
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    # adds to what the student owes, e.g. a semester fee or a fine
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can set dues")
+
+    record_id = await _record_id(db, req.username)
+    await _post(db, record_id, "charge", req.amount, user["username"])
+    await db.commit()
+
+    return await _respond(db, req.username)
 
 
 @router.post("/pay", response_model=FeeRecord)
-def pay(
+async def pay(
     req: PayRequest,
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     # admin records a payment
     if user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Only admin can record payments")
 
-    record = (
-        db.query(FeeRecordDB)
-        .filter(FeeRecordDB.username == req.username)
-        .first()
+    record_id = await _record_id(db, req.username)
+    db.add(PaymentDB(fee_record_id=record_id, amount=req.amount, timestamp=datetime.utcnow()))
+    # overpayment leaves a negative balance (credit) rather than vanishing
+    await _post(db, record_id, "payment", -req.amount, user["username"])
+    await db.commit()
+
+    return await _respond(db, req.username)
+
+
+@router.post("/import/{kind}", response_model=FeeImportResult)
+async def import_fees(
+    kind: str,
+    file: UploadFile = File(...),
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    # CSV with username,amount columns (others are ignored). dues set each
+    # student's balance; payments record each row as a payment. Bad rows are
+    # reported and skipped; the rest are applied in one transaction.
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can import fees")
+    if kind not in {"dues", "payments"}:
+        raise HTTPException(status_code=404, detail="Unknown import kind")
+
+    errors: List[FeeImportError] = []
+    total = imported = 0
+    async for batch in iter_csv_batches(file, ["username", "amount"], IMPORT_BATCH):
+        total += len(batch)
+        imported += await _import_batch(db, kind, batch, user["username"], errors)
+        # keep the report bounded however bad the file is
+        del errors[MAX_IMPORT_ERRORS:]
+    await db.commit()
+
+    errors.sort(key=lambda e: e.line)
+    return FeeImportResult(kind=kind, rows=total, imported=imported, failed=total - imported, errors=errors)
+
+
+@router.get("/export")
+async def export_balances(
+    fmt: str = Query("csv", alias="format", pattern="^(csv|xlsx)$"),
+    user=Depends(get_current_user),
+):
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can view all fees")
+
+    stmt = select(FeeRecordDB.username, FeeRecordDB.total_due).order_by(FeeRecordDB.id)
+    return export_response(stmt, ["username", "total_due"], "fee_balances", fmt)
+
+
+@router.get("/payments/export")
+async def export_payments(
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    fmt: str = Query("csv", alias="format", pattern="^(csv|xlsx)$"),
+    user=Depends(get_current_user),
+):
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can view all fees")
+
+    stmt = select(FeeRecordDB.username, PaymentDB.amount, PaymentDB.timestamp).join(
+        FeeRecordDB, PaymentDB.fee_record_id == FeeRecordDB.id
     )
-    if record is None:
-        record = FeeRecordDB(username=req.username, total_due=0.0)
-        db.add(record)
-        db.commit()
-        db.refresh(record)
-
-    payment = PaymentDB(
-        fee_record_id=record.id,
-        amount=req.amount,
-        timestamp=datetime.utcnow(),
+    if from_date:
+        stmt = stmt.where(PaymentDB.timestamp >= datetime.combine(from_date, time.min))
+    if to_date:
+        stmt = stmt.where(PaymentDB.timestamp < datetime.combine(to_date + timedelta(days=1), time.min))
+    stmt = stmt.order_by(PaymentDB.id)
+    return export_response(stmt, ["username", "amount", "timestamp"], "fee_payments", fmt)
+
+
+@router.get("/ledger/{username}", response_model=List[LedgerEntry])
+async def fee_ledger(
+    username: str,
+    response: Response,
+    page: PageParams = Depends(),
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    if user["role"] != "admin" and user["username"] != username:
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+    stmt = (
+        select(FeeLedgerEntryDB)
+        .join(FeeRecordDB, FeeLedgerEntryDB.fee_record_id == FeeRecordDB.id)
+        .where(FeeRecordDB.username == username)
     )
-    db.add(payment)
+    rows = await paginate(db, stmt, [FeeLedgerEntryDB.id], page, response)
+    return [
+        LedgerEntry(kind=r.kind, amount=r.amount, created_at=r.created_at, created_by=r.created_by)
+        for r in rows
+    ]
+
+
+@router.post("/ledger/rebuild", response_model=LedgerRebuildResult)
+async def rebuild_balances(
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    # recompute every total_due from the ledger in two set-based statements
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can rebuild balances")
 
-    record.total_due = max(record.total_due - req.amount, 0.0)
+    ledger_sum = func.coalesce(
+        select(func.sum(FeeLedgerEntryDB.amount))
+        .where(FeeLedgerEntryDB.fee_record_id == FeeRecordDB.id)
+        .scalar_subquery(),
+        0,
+    )
+    records = await db.scalar(select(func.count(FeeRecordDB.id)))
+    result = await db.execute(
+        update(FeeRecordDB)
+        .where(FeeRecordDB.total_due != ledger_sum)
+        .values(total_due=ledger_sum)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
 
-    db.commit()
-    db.refresh(record)
+    return LedgerRebuildResult(records=records, corrected=result.rowcount)
 
-    return _to_fee_record_schema(record)
 
+@router.get("/page", response_model=List[FeeRecord])
+async def list_fees_page(
+    response: Response,
+    page: PageParams = Depends(),
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can view all fees")
+
+    # payments for the whole page come from one IN (...) query
+    stmt = select(FeeRecordDB).options(selectinload(FeeRecordDB.payments))
+    rows = await paginate(db, stmt, [FeeRecordDB.id], page, response)
+    return [_to_fee_record_schema(r) for r in rows]
 
-@router.get("/all", response_model=List[FeeRecord])
-def list_all_fees(
+
+@router.get("/summary", response_model=FeeSummary)
+async def fees_summary(
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     if user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Only admin can view all fees")
 
-    records = db.query(FeeRecordDB).all()
-    return [_to_fee_record_schema(r) for r in records]
+    result = await db.execute(
+        select(
+            func.count(FeeRecordDB.id),
+            # credits (negative balances) don't offset other students' dues
+            func.coalesce(func.sum(case((FeeRecordDB.total_due > 0, FeeRecordDB.total_due), else_=0)), 0),
+            func.coalesce(func.sum(case((FeeRecordDB.total_due > 0, 1), else_=0)), 0),
+        )
+    )
+    students, outstanding, defaulters = result.one()
+    collected = await db.scalar(select(func.coalesce(func.sum(PaymentDB.amount), 0)))
+
+    return FeeSummary(
+        students=students,
+        total_outstanding=outstanding,
+        total_collected=collected,
+        defaulters=defaulters,
+    )
 
 
 @router.get("/my", response_model=FeeRecord)
-def my_fees(
+async def my_fees(
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     username = user["username"]
-    record = (
-        db.query(FeeRecordDB)
-        .filter(FeeRecordDB.username == username)
-        .first()
-    )
+    record = await _get_record(db, username)
     if record is None:
-        return FeeRecord(username=username, total_due=0.0, payments=[])
+        return FeeRecord(username=username, total_due=0, payments=[])
 
     return _to_fee_record_schema(record)
@@ -1,15 +1,22 @@
-from datetime import datetime
-from typing import List
+from datetime import date, datetime
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.dependencies import get_db
+from app.core.events import broker
+from app.core.export import export_response
+from app.core.pagination import PageParams, paginate
+from app.dependencies import get_db, get_read_db
 from app.models.gatepass import (
     GatePassDB,
     GatePass,
     CreateGatePassRequest,
     DecisionRequest,
+    BulkDecisionRequest,
+    BulkDecisionResult,
+    GatePassSummary,
 )
 from app.routers.auth import get_current_user  # real auth
 
@@ -31,18 +38,40 @@ def _to_schema(gp: GatePassDB) -> GatePass:
     )
 
 
+def _covering(stmt, start: date, end: date):
+    # closed intervals [from_date, to_date] and [start, end] overlap
+    return stmt.where(GatePassDB.to_date >= start, GatePassDB.from_date <= end)
+
+
 # ---- endpoints ----
 
 @router.post("/", response_model=GatePass)
-def create_gatepass(
+async def create_gatepass(
     req: CreateGatePassRequest,
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     # students create their own gate pass requests
     if user["role"] != "student":
         raise HTTPException(status_code=403, detail="Only students can request gate pass")
 
+    if req.to_date < req.from_date:
+        raise HTTPException(status_code=400, detail="to_date must not be before from_date")
+
+    clash = await db.scalar(
+        _covering(select(GatePassDB.id), req.from_date, req.to_date)
+        .where(
+            GatePassDB.student_username == user["username"],
+            GatePassDB.status.in_(("pending", "approved")),
+        )
+        .limit(1)
+    )
+    if clash is not None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Overlaps your gate pass {clash} for the same dates",
+        )
+
     gp = GatePassDB(
         student_username=user["username"],
         from_date=req.from_date,
@@ -52,48 +81,188 @@ def create_gatepass(
         created_at=datetime.utcnow(),
     )
     db.add(gp)
-    db.commit()
-    db.refresh(gp)
+    await db.commit()
+    await db.refresh(gp)
 
     return _to_schema(gp)
 
 
 @router.get("/my", response_model=List[GatePass])
-def my_gatepasses(
+async def my_gatepasses(
+    response: Response,
+    page: PageParams = Depends(),
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     if user["role"] != "student":
         raise HTTPException(status_code=403, detail="Only students can view their gate passes")
 
-    rows = (
-        db.query(GatePassDB)
-        .filter(GatePassDB.student_username == user["username"])
-        .order_by(GatePassDB.created_at.desc())
-        .all()
-    )
+    stmt = select(GatePassDB).where(GatePassDB.student_username == user["username"])
+    rows = await paginate(db, stmt, [GatePassDB.created_at, GatePassDB.id], page, response, descending=True)
     return [_to_schema(r) for r in rows]
 
 
 @router.get("/", response_model=List[GatePass])
-def list_all(
+async def list_all(
+    response: Response,
+    page: PageParams = Depends(),
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     # admin sees all gate passes
     if user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Only admin can view all gate passes")
 
-    rows = db.query(GatePassDB).order_by(GatePassDB.created_at.desc()).all()
+    stmt = select(GatePassDB)
+    rows = await paginate(db, stmt, [GatePassDB.created_at, GatePassDB.id], page, response, descending=True)
+    return [_to_schema(r) for r in rows]
+
+
+@router.get("/summary", response_model=GatePassSummary)
+async def gatepass_summary(
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # counts over every pass; the list endpoints only return a page
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can view all gate passes")
+
+    result = await db.execute(
+        select(GatePassDB.status, func.count(GatePassDB.id)).group_by(GatePassDB.status)
+    )
+    by_status = {status: count for status, count in result.all()}
+    return GatePassSummary(total=sum(by_status.values()), by_status=by_status)
+
+
+@router.get("/out", response_model=List[GatePass])
+async def passes_covering(
+    response: Response,
+    on: Optional[date] = None,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    status: str = Query("approved", pattern="^(pending|approved|rejected)$"),
+    page: PageParams = Depends(),
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # passes covering a date (?on=) or overlapping a range; approved ones by
+    # default, i.e. who is out of the hostel
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can view all gate passes")
+
+    if on is not None:
+        start = end = on
+    elif from_date is not None and to_date is not None:
+        start, end = from_date, to_date
+    else:
+        raise HTTPException(status_code=400, detail="Give either on or from_date and to_date")
+    if start > end:
+        raise HTTPException(status_code=400, detail="from_date must not be after to_date")
+
+    stmt = _covering(select(GatePassDB).where(GatePassDB.status == status), start, end)
+    rows = await paginate(db, stmt, [GatePassDB.id], page, response)
     return [_to_schema(r) for r in rows]
 
 
+@router.get("/export")
+async def export_gatepasses(
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    fmt: str = Query("csv", alias="format", pattern="^(csv|xlsx)$"),
+    user=Depends(get_current_user),
+):
+    # passes overlapping [from_date, to_date], or all of them
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can view all gate passes")
+
+    columns = [
+        GatePassDB.id,
+        GatePassDB.student_username,
+        GatePassDB.from_date,
+        GatePassDB.to_date,
+        GatePassDB.reason,
+        GatePassDB.status,
+        GatePassDB.created_at,
+        GatePassDB.decided_at,
+    ]
+    stmt = select(*columns)
+    if from_date:
+        stmt = stmt.where(GatePassDB.to_date >= from_date)
+    if to_date:
+        stmt = stmt.where(GatePassDB.from_date <= to_date)
+    stmt = stmt.order_by(GatePassDB.id)
+    return export_response(stmt, [c.key for c in columns], "gatepasses", fmt)
+
+
+@router.post("/decide", response_model=BulkDecisionResult)
+async def decide_gatepasses(
+    req: BulkDecisionRequest,
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    # clear the admin queue in one UPDATE; only pending passes are touched,
+    # so repeating the request or overlapping filters can't flip decisions
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can decide gate passes")
+
+    if req.status not in {"approved", "rejected"}:
+        raise HTTPException(status_code=400, detail="Invalid status")
+
+    filters = []
+    if req.ids is not None:
+        filters.append(GatePassDB.id.in_(req.ids))
+    if req.from_date is not None:
+        filters.append(GatePassDB.from_date >= req.from_date)
+    if req.to_date is not None:
+        filters.append(GatePassDB.from_date <= req.to_date)
+    if not filters:
+        raise HTTPException(status_code=400, detail="Give ids, from_date or to_date")
+
+    # whole seconds: MySQL DATETIME drops microseconds, so every backend
+    # reports the same value it stored
+    decided_at = datetime.utcnow().replace(microsecond=0)
+    stmt = (
+        update(GatePassDB)
+        .where(GatePassDB.status == "pending", *filters)
+        .values(status=req.status, decided_at=decided_at)
+    )
+    if db.bind.dialect.update_returning:
+        result = await db.execute(stmt.returning(GatePassDB))
+        rows = result.scalars().all()
+    else:
+        # no RETURNING (MySQL): lock exactly the pending passes we are about
+        # to decide, so the result can't pick up passes decided elsewhere
+        ids = (
+            await db.execute(
+                select(GatePassDB.id).where(GatePassDB.status == "pending", *filters).with_for_update()
+            )
+        ).scalars().all()
+        rows = []
+        # chunked IN lists keep every backend under its bound-parameter limit
+        for start in range(0, len(ids), 900):
+            chunk = ids[start:start + 900]
+            await db.execute(
+                stmt.where(GatePassDB.id.in_(chunk)).execution_options(synchronize_session=False)
+            )
+            result = await db.execute(
+                select(GatePassDB).where(GatePassDB.id.in_(chunk)).execution_options(populate_existing=True)
+            )
+            rows.extend(result.scalars().all())
+    await db.commit()
+
+    rows = sorted(rows, key=lambda gp: gp.id)
+    passes = [_to_schema(r) for r in rows]
+    for gp in passes:
+        broker.publish(gp.student_username, "gatepass", gp.model_dump(mode="json"))
+    return BulkDecisionResult(updated=len(passes), passes=passes)
+
+
 @router.post("/{gatepass_id}/decide", response_model=GatePass)
-def decide_gatepass(
+async def decide_gatepass(
     gatepass_id: int,
     req: DecisionRequest,
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     if user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Only admin can decide gate passes")
@@ -101,14 +270,16 @@ def decide_gatepass(
     if req.status not in {"approved", "rejected"}:
         raise HTTPException(status_code=400, detail="Invalid status")
 
-    gp = db.query(GatePassDB).filter(GatePassDB.id == gatepass_id).first()
+    gp = await db.get(GatePassDB, gatepass_id)
     if gp is None:
         raise HTTPException(status_code=404, detail="Gate pass not found")
 
     gp.status = req.status
     gp.decided_at = datetime.utcnow()
 
-    db.commit()
-    db.refresh(gp)
+    await db.commit()
+    await db.refresh(gp)
 
-    return _to_schema(gp)
+    result = _to_schema(gp)
+    broker.publish(gp.student_username, "gatepass", result.model_dump(mode="json"))
+    return result
@@ -1,14 +1,20 @@
 from datetime import date
-from typing import List, Set
+from typing import List, Optional, Set
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.dependencies import get_db
+from app.core.bulk import insert_ignore
+from app.core.export import export_response
+from app.dependencies import get_db, get_read_db
 from app.models.hostel_attendance import (
-    HostelAttendanceDB,
+    HostelAttendanceEntryDB,
     HostelAttendance,
     MarkRequest,
+    RollCallRequest,
+    RollCallResult,
+    RollCallResponse,
 )
 from app.routers.auth import get_current_user
 
@@ -17,84 +23,144 @@ router = APIRouter(prefix="/api/hostel-attendance", tags=["hostel_attendance"])
 
 # ---- helper functions ----
 
-def _names_from_str(s: str) -> Set[str]:
-    if not s:
-        return set()
-    return set(s.split(","))
+async def _present_on(db: AsyncSession, day: date) -> HostelAttendance:
+    result = await db.execute(
+        select(HostelAttendanceEntryDB.username).where(HostelAttendanceEntryDB.day == day)
+    )
+    return HostelAttendance(day=day, present_students=set(result.scalars()))
 
 
-def _names_to_str(names: Set[str]) -> str:
-    return ",".join(sorted(names))
+async def _apply_roll_call(db: AsyncSession, day: date, present: Set[str], absent: Set[str]) -> Set[str]:
+    """Mark present/absent in set-based statements; returns who was present before."""
+    result = await db.execute(
+        select(HostelAttendanceEntryDB.username).where(
+            HostelAttendanceEntryDB.day == day,
+            HostelAttendanceEntryDB.username.in_(present | absent),
+        )
+    )
+    before = set(result.scalars())
+    # ON CONFLICT DO NOTHING / DELETE ... IN: no read-modify-write, so two
+    # wardens marking the same day concurrently cannot drop each other's rows
+    await insert_ignore(
+        db,
+        HostelAttendanceEntryDB,
+        [{"day": day, "username": u} for u in sorted(present)],
+    )
+    if absent:
+        await db.execute(
+            delete(HostelAttendanceEntryDB).where(
+                HostelAttendanceEntryDB.day == day,
+                HostelAttendanceEntryDB.username.in_(absent),
+            )
+        )
+    return before
 
 
 # ---- endpoints ----
 
 @router.post("/mark", response_model=HostelAttendance)
-def mark_attendance(
+async def mark_attendance(
     req: MarkRequest,
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     if user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Only admin can mark hostel attendance")
 
-    record = (
-        db.query(HostelAttendanceDB)
-        .filter(HostelAttendanceDB.day == req.day)
-        .first()
-    )
-    if record is None:
-        record = HostelAttendanceDB(day=req.day, present_usernames="")
-        db.add(record)
-
-    names = _names_from_str(record.present_usernames)
     if req.present:
-        names.add(req.username)
+        await _apply_roll_call(db, req.day, {req.username}, set())
     else:
-        names.discard(req.username)
-    record.present_usernames = _names_to_str(names)
+        await _apply_roll_call(db, req.day, set(), {req.username})
+    await db.commit()
+
+    return await _present_on(db, req.day)
+
+
+@router.post("/roll-call", response_model=RollCallResponse)
+async def roll_call(
+    req: RollCallRequest,
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    # mark a whole block in one request and one transaction
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can mark hostel attendance")
 
-    db.commit()
-    db.refresh(record)
+    present = set(req.present)
+    absent = set(req.absent)
+    both = present & absent
+    if both:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Listed as both present and absent: {', '.join(sorted(both))}",
+        )
+
+    before = await _apply_roll_call(db, req.day, present, absent)
+    await db.commit()
+
+    results = [
+        RollCallResult(
+            username=u,
+            present=True,
+            result="unchanged" if u in before else "added",
+        )
+        for u in sorted(present)
+    ] + [
+        RollCallResult(
+            username=u,
+            present=False,
+            result="removed" if u in before else "unchanged",
+        )
+        for u in sorted(absent)
+    ]
+    return RollCallResponse(day=req.day, results=results)
+
+
+@router.get("/export")
+async def export_attendance(
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    fmt: str = Query("csv", alias="format", pattern="^(csv|xlsx)$"),
+    user=Depends(get_current_user),
+):
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can export hostel attendance")
 
-    return HostelAttendance(day=record.day, present_students=_names_from_str(record.present_usernames))
+    # (day, username) order walks the unique index
+    stmt = select(HostelAttendanceEntryDB.day, HostelAttendanceEntryDB.username)
+    if from_date:
+        stmt = stmt.where(HostelAttendanceEntryDB.day >= from_date)
+    if to_date:
+        stmt = stmt.where(HostelAttendanceEntryDB.day <= to_date)
+    stmt = stmt.order_by(HostelAttendanceEntryDB.day, HostelAttendanceEntryDB.username)
+    return export_response(stmt, ["day", "username"], "hostel_attendance", fmt)
 
 
 @router.get("/day", response_model=HostelAttendance)
-def get_day_attendance(
+async def get_day_attendance(
     day: date,
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     if user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Only admin can view full day attendance")
 
-    record = (
-        db.query(HostelAttendanceDB)
-        .filter(HostelAttendanceDB.day == day)
-        .first()
-    )
-    if record is None:
-        return HostelAttendance(day=day, present_students=set())
-
-    return HostelAttendance(day=record.day, present_students=_names_from_str(record.present_usernames))
+    return await _present_on(db, day)
 
 
 @router.get("/my", response_model=List[HostelAttendance])
-def my_attendance(
+async def my_attendance(
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     if user["role"] != "student":
         raise HTTPException(status_code=403, detail="Only students can view their own attendance")
 
+    # only this student's days; other residents' names are not exposed
     username = user["username"]
-    rows = db.query(HostelAttendanceDB).all()
-    result: List[HostelAttendance] = []
-
-    for r in rows:
-        names = _names_from_str(r.present_usernames)
-        if username in names:
-            result.append(HostelAttendance(day=r.day, present_students=names))
-
-    return result
+    result = await db.execute(
+        select(HostelAttendanceEntryDB.day)
+        .where(HostelAttendanceEntryDB.username == username)
+        .order_by(HostelAttendanceEntryDB.day)
+    )
+    return [HostelAttendance(day=d, present_students={username}) for d in result.scalars()]
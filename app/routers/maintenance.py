@@ -1,26 +1,61 @@
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from sqlalchemy import func, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.dependencies import get_db
+from app.core.events import broker
+from app.core.export import export_response
+from app.core.pagination import PageParams, paginate
+from app.dependencies import get_db, get_read_db
 from app.models.maintenance import (
+    TICKET_FTS_TABLE,
     MaintenanceTicketDB,
     TicketCreate,
     TicketUpdate,
     TicketRead,
+    TicketSummary,
 )
+from app.models.rooms import RoomDB
 from app.routers.auth import get_current_user
 
 router = APIRouter(prefix="/api/maintenance", tags=["maintenance"])
 
 
+def _text_match(db: AsyncSession, q: str):
+    """WHERE clause for a full-text search over title and description."""
+    name = db.bind.dialect.name
+    if name == "postgresql":
+        # same expression as the GIN index built by app/migrations.py
+        return text(
+            "to_tsvector('english', maintenance_tickets.title || ' ' || "
+            "maintenance_tickets.description) @@ plainto_tsquery('english', :q)"
+        ).bindparams(q=q)
+    if name == "sqlite":
+        # quote each word so FTS5 operators in user input are matched literally
+        terms = " ".join('"' + t.replace('"', '""') + '"' for t in q.split())
+        return MaintenanceTicketDB.id.in_(
+            select(text("rowid"))
+            .select_from(text(TICKET_FTS_TABLE))
+            .where(text(f"{TICKET_FTS_TABLE} MATCH :terms").bindparams(terms=terms))
+        )
+    if name in {"mysql", "mariadb"}:
+        from sqlalchemy.dialects.mysql import match
+        return match(MaintenanceTicketDB.title, MaintenanceTicketDB.description, against=q)
+    # no full-text index: substring match
+    pattern = f"%{q}%"
+    return or_(
+        MaintenanceTicketDB.title.ilike(pattern),
+        MaintenanceTicketDB.description.ilike(pattern),
+    )
+
+
 @router.post("/", response_model=TicketRead)
-def create_ticket(
+async def create_ticket(
     data: TicketCreate,
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     # only students create maintenance tickets
     if user["role"] != "student":
@@ -37,52 +72,126 @@ def create_ticket(
         updated_at=now,
     )
     db.add(ticket)
-    db.commit()
-    db.refresh(ticket)
+    await db.commit()
+    await db.refresh(ticket)
     return ticket
 
 
 @router.get("/", response_model=List[TicketRead])
-def list_all_tickets(
+async def list_all_tickets(
+    response: Response,
+    page: PageParams = Depends(),
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     # admin sees all, students see only their own
-    query = db.query(MaintenanceTicketDB)
+    stmt = select(MaintenanceTicketDB)
     if user["role"] != "admin":
-        query = query.filter(MaintenanceTicketDB.created_by == user["username"])
+        stmt = stmt.where(MaintenanceTicketDB.created_by == user["username"])
+
+    order_by = [MaintenanceTicketDB.created_at, MaintenanceTicketDB.id]
+    return await paginate(db, stmt, order_by, page, response, descending=True)
+
 
-    return query.order_by(MaintenanceTicketDB.created_at.desc()).all()
+@router.get("/summary", response_model=TicketSummary)
+async def tickets_summary(
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # counts over every ticket the user can see; the list only returns a page
+    stmt = select(MaintenanceTicketDB.status, func.count(MaintenanceTicketDB.id))
+    if user["role"] != "admin":
+        stmt = stmt.where(MaintenanceTicketDB.created_by == user["username"])
+
+    result = await db.execute(stmt.group_by(MaintenanceTicketDB.status))
+    by_status = {status: count for status, count in result.all()}
+    return TicketSummary(total=sum(by_status.values()), by_status=by_status)
+
+
+@router.get("/search", response_model=List[TicketRead])
+async def search_tickets(
+    response: Response,
+    q: Optional[str] = None,
+    status: Optional[str] = None,
+    room_number: Optional[str] = None,
+    block: Optional[str] = None,
+    created_by: Optional[str] = None,
+    page: PageParams = Depends(),
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # newest first, like the plain list; students only search their own
+    stmt = select(MaintenanceTicketDB)
+    if user["role"] != "admin":
+        stmt = stmt.where(MaintenanceTicketDB.created_by == user["username"])
+    elif created_by:
+        stmt = stmt.where(MaintenanceTicketDB.created_by == created_by)
+    if status:
+        stmt = stmt.where(MaintenanceTicketDB.status == status)
+    if room_number:
+        stmt = stmt.where(MaintenanceTicketDB.room_number == room_number)
+    if block:
+        stmt = stmt.where(
+            MaintenanceTicketDB.room_number.in_(
+                select(RoomDB.room_number).where(RoomDB.block == block)
+            )
+        )
+    if q and q.strip():
+        stmt = stmt.where(_text_match(db, q.strip()))
+
+    order_by = [MaintenanceTicketDB.created_at, MaintenanceTicketDB.id]
+    return await paginate(db, stmt, order_by, page, response, descending=True)
+
+
+@router.get("/export")
+async def export_tickets(
+    status: Optional[str] = None,
+    fmt: str = Query("csv", alias="format", pattern="^(csv|xlsx)$"),
+    user=Depends(get_current_user),
+):
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can export tickets")
+
+    columns = [
+        MaintenanceTicketDB.id,
+        MaintenanceTicketDB.created_by,
+        MaintenanceTicketDB.room_number,
+        MaintenanceTicketDB.title,
+        MaintenanceTicketDB.description,
+        MaintenanceTicketDB.status,
+        MaintenanceTicketDB.created_at,
+        MaintenanceTicketDB.updated_at,
+    ]
+    stmt = select(*columns)
+    if status:
+        stmt = stmt.where(MaintenanceTicketDB.status == status)
+    stmt = stmt.order_by(MaintenanceTicketDB.id)
+    return export_response(stmt, [c.key for c in columns], "maintenance_tickets", fmt)
 
 
 @router.get("/my", response_model=List[TicketRead])
-def list_my_tickets(
+async def list_my_tickets(
+    response: Response,
+    page: PageParams = Depends(),
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     if user["role"] != "student":
         raise HTTPException(status_code=403, detail="Only students can view their tickets")
 
-    return (
-        db.query(MaintenanceTicketDB)
-        .filter(MaintenanceTicketDB.created_by == user["username"])
-        .order_by(MaintenanceTicketDB.created_at.desc())
-        .all()
-    )
+    stmt = select(MaintenanceTicketDB).where(MaintenanceTicketDB.created_by == user["username"])
+    order_by = [MaintenanceTicketDB.created_at, MaintenanceTicketDB.id]
+    return await paginate(db, stmt, order_by, page, response, descending=True)
 
 
 @router.patch("/{ticket_id}", response_model=TicketRead)
-def update_ticket(
+async def update_ticket(
     ticket_id: int,
     data: TicketUpdate,
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    ticket = (
-        db.query(MaintenanceTicketDB)
-        .filter(MaintenanceTicketDB.id == ticket_id)
-        .first()
-    )
+    ticket = await db.get(MaintenanceTicketDB, ticket_id)
     if not ticket:
         raise HTTPException(status_code=404, detail="Ticket not found")
 
@@ -96,6 +205,9 @@ def update_ticket(
 
     ticket.updated_at = datetime.utcnow()
     db.add(ticket)
-    db.commit()
-    db.refresh(ticket)
-    return ticket
+    await db.commit()
+    await db.refresh(ticket)
+
+    result = TicketRead.model_validate(ticket)
+    broker.publish(ticket.created_by, "ticket", result.model_dump(mode="json"))
+    return result
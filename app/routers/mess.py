@@ -1,26 +1,49 @@
+import csv
+import hashlib
+import io
+import itertools
+import json
 from datetime import date
-from typing import List, Optional, Set
-
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-
-from app.dependencies import get_db
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from pydantic import ValidationError
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.bulk import insert_ignore, upsert, upsert_add
+from app.core.cache import TTLCache
+from app.core.export import export_response
+from app.core.pagination import PageParams, paginate
+from app.dependencies import get_db, get_read_db
 from app.models.mess import (
     MEALS,
     DailyMenuDB,
-    MealAttendanceDB,
+    MealAttendanceEntryDB,
+    MealHeadcountDB,
     MealStatsDB,
+    MealStatsDailyDB,
     DailyMenu,
     MealAttendance,
+    MealHeadcount,
     MealStats,
     MenuSetRequest,
+    MenuBulkRequest,
+    MenuBulkResult,
     StatsSetRequest,
     AttendanceRequest,
+    WastageBucket,
+    month_start,
+    week_start,
 )
 from app.routers.auth import get_current_user
 
 router = APIRouter(prefix="/api/mess", tags=["mess"])
 
+# rows per INSERT ... ON CONFLICT statement; keeps well under SQLite's
+# bound-parameter limit (3 columns per row)
+MENU_BULK_BATCH = 300
+
 
 # ---------- helper converters ----------
 
@@ -34,23 +57,102 @@ def _items_from_str(s: str) -> List[str]:
     return s.split(",")
 
 
-def _attendees_to_str(attendees: Set[str]) -> str:
-    return ",".join(sorted(attendees))
+async def _bump_headcount(db: AsyncSession, day: date, meal: str, delta: int) -> None:
+    # one INSERT ... ON CONFLICT DO UPDATE: concurrent check-ins neither lose
+    # counts nor race to create the first row of a meal
+    await upsert_add(
+        db,
+        MealHeadcountDB,
+        {"day": day, "meal": meal, "headcount": max(delta, 0)},
+        index_elements=["day", "meal"],
+        increments={"headcount": delta},
+    )
 
 
-def _attendees_from_str(s: str) -> Set[str]:
-    if not s:
-        return set()
-    return set(s.split(","))
+async def _bump_stats_rollup(
+    db: AsyncSession, day: date, meal: str, prepared: int, served: int, entries: int
+) -> None:
+    # apply set_stats' change to the daily rollup as a delta, in one upsert
+    # like _bump_headcount, so the first stats for a meal can't race
+    await upsert_add(
+        db,
+        MealStatsDailyDB,
+        {
+            "day": day,
+            "meal": meal,
+            "week_start": week_start(day),
+            "month_start": month_start(day),
+            "plates_prepared": prepared,
+            "plates_served": served,
+            "entries": entries,
+        },
+        index_elements=["day", "meal"],
+        increments={"plates_prepared": prepared, "plates_served": served, "entries": entries},
+    )
+
+
+# ---------- menu read cache ----------
+#
+# day -> (etag, JSON body). set_menu and bulk_set_menu drop the days they
+# change in this process; other worker processes pick the change up when
+# their entry expires.
+#
+# Each invalidation also stamps the day with a fresh generation. A reader
+# only stores what it queried if the day's generation is unchanged, so a
+# query that started before an update can't put the old menu back. Stamps
+# are never reused and outlive any query, so eviction can't fake a match.
+
+_menu_cache = TTLCache(maxsize=512, ttl=60)
+_menu_generations = TTLCache(maxsize=4096, ttl=3600)
+_next_generation = itertools.count(1)
+
+
+def invalidate_menu_cache(day: date) -> None:
+    _menu_generations.set(day, next(_next_generation))
+    _menu_cache.pop(day)
+
+
+async def _menu_body(db: AsyncSession, day: date) -> Tuple[str, bytes]:
+    cached = _menu_cache.get(day)
+    if cached is None:
+        generation = _menu_generations.get(day)
+        result = await db.execute(
+            select(DailyMenuDB).where(DailyMenuDB.day == day).order_by(DailyMenuDB.id)
+        )
+        menus = [
+            {"day": r.day.isoformat(), "meal": r.meal, "items": _items_from_str(r.items)}
+            for r in result.scalars()
+        ]
+        body = json.dumps(menus, separators=(",", ":")).encode()
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        cached = (etag, body)
+        if _menu_generations.get(day) == generation:
+            _menu_cache.set(day, cached)
+    return cached
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return "*" in candidates or any(c.removeprefix("W/") == etag for c in candidates)
+
+
+async def _menu_response(request: Request, db: AsyncSession, day: date) -> Response:
+    etag, body = await _menu_body(db, day)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 # ---------- menu endpoints ----------
 
 @router.post("/menu", response_model=DailyMenu)
-def set_menu(
+async def set_menu(
     req: MenuSetRequest,
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     if user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Only admin can set menu")
@@ -58,55 +160,141 @@ def set_menu(
     if req.meal not in MEALS:
         raise HTTPException(status_code=400, detail="Invalid meal")
 
-    obj = (
-        db.query(DailyMenuDB)
-        .filter(DailyMenuDB.day == req.day, DailyMenuDB.meal == req.meal)
-        .first()
+    # one statement, so concurrent first saves of a (day, meal) can't collide
+    items = _items_to_str(req.items)
+    await upsert(
+        db,
+        DailyMenuDB,
+        [{"day": req.day, "meal": req.meal, "items": items}],
+        index_elements=["day", "meal"],
+        update_columns=["items"],
     )
-    if obj is None:
-        obj = DailyMenuDB(day=req.day, meal=req.meal, items=_items_to_str(req.items))
-        db.add(obj)
+    await db.commit()
+    invalidate_menu_cache(req.day)
+
+    return DailyMenu(day=req.day, meal=req.meal, items=_items_from_str(items))
+
+
+def _parse_menu_csv(body: bytes) -> List[MenuSetRequest]:
+    # header: day,meal,items  with items comma-separated inside quotes
+    try:
+        reader = csv.DictReader(io.StringIO(body.decode("utf-8-sig")))
+        rows = list(reader)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid CSV: {e}")
+    if not {"day", "meal", "items"} <= set(reader.fieldnames or []):
+        raise HTTPException(status_code=400, detail="CSV must have day, meal and items columns")
+
+    entries = []
+    for line, row in enumerate(rows, start=2):
+        # short rows leave the missing columns as None
+        meal = (row["meal"] or "").strip()
+        try:
+            if not meal:
+                raise ValueError("meal is required")
+            entries.append(
+                MenuSetRequest(
+                    day=row["day"],
+                    meal=meal,
+                    items=[i.strip() for i in (row["items"] or "").split(",") if i.strip()],
+                )
+            )
+        except (ValidationError, ValueError):
+            raise HTTPException(status_code=400, detail=f"Invalid CSV row on line {line}")
+    return entries
+
+
+@router.post("/menu/bulk", response_model=MenuBulkResult)
+async def bulk_set_menu(
+    request: Request,
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    # publish a week or month of menus (JSON {"entries": [...]} or text/csv)
+    # in one transaction instead of one request per (day, meal)
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can set menu")
+
+    body = await request.body()
+    if request.headers.get("content-type", "").startswith("text/csv"):
+        entries = _parse_menu_csv(body)
     else:
-        obj.items = _items_to_str(req.items)
+        try:
+            entries = MenuBulkRequest.model_validate_json(body).entries
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+
+    bad = sorted({e.meal for e in entries if e.meal not in MEALS})
+    if bad:
+        raise HTTPException(status_code=400, detail=f"Invalid meal: {', '.join(bad)}")
+
+    # last entry wins for a repeated (day, meal); one row may not be
+    # upserted twice in the same statement
+    rows: Dict[Tuple[date, str], Dict] = {}
+    for e in entries:
+        rows[(e.day, e.meal)] = {"day": e.day, "meal": e.meal, "items": _items_to_str(e.items)}
+    batch = list(rows.values())
+
+    for start in range(0, len(batch), MENU_BULK_BATCH):
+        await upsert(
+            db,
+            DailyMenuDB,
+            batch[start:start + MENU_BULK_BATCH],
+            index_elements=["day", "meal"],
+            update_columns=["items"],
+        )
+    await db.commit()
 
-    db.commit()
-    db.refresh(obj)
+    days = {day for day, _ in rows}
+    for day in days:
+        invalidate_menu_cache(day)
 
-    return DailyMenu(day=obj.day, meal=obj.meal, items=_items_from_str(obj.items))
+    return MenuBulkResult(
+        upserted=len(batch),
+        from_date=min(days) if days else None,
+        to_date=max(days) if days else None,
+    )
 
 
 @router.get("/menu", response_model=List[DailyMenu])
-def list_menus(
+async def list_menus(
+    request: Request,
+    response: Response,
     day: Optional[date] = None,
-    db: Session = Depends(get_db),
+    page: PageParams = Depends(),
+    # primary, not replica: a lagging replica would refill the menu cache
+    # with the pre-update menu right after set_menu invalidates it
+    db: AsyncSession = Depends(get_db),
 ):
-    q = db.query(DailyMenuDB)
+    # a single day's menu is small and hot: serve it from the cache
+    if day and not page.after:
+        return await _menu_response(request, db, day)
+
+    stmt = select(DailyMenuDB)
     if day:
-        q = q.filter(DailyMenuDB.day == day)
-    rows = q.all()
+        stmt = stmt.where(DailyMenuDB.day == day)
+    # newest day first, so page one always has the latest menus
+    rows = await paginate(db, stmt, [DailyMenuDB.day, DailyMenuDB.id], page, response, descending=True)
     return [DailyMenu(day=r.day, meal=r.meal, items=_items_from_str(r.items)) for r in rows]
 
 
 @router.get("/menu/today", response_model=List[DailyMenu])
-def today_menu(
-    today: date = date.today(),
-    db: Session = Depends(get_db),
+async def today_menu(
+    request: Request,
+    today: Optional[date] = None,
+    db: AsyncSession = Depends(get_db),  # fills the menu cache; see list_menus
 ):
-    rows = (
-        db.query(DailyMenuDB)
-        .filter(DailyMenuDB.day == today)
-        .all()
-    )
-    return [DailyMenu(day=r.day, meal=r.meal, items=_items_from_str(r.items)) for r in rows]
+    # evaluated per request; a default of date.today() would be frozen at import
+    return await _menu_response(request, db, today or date.today())
 
 
 # ---------- attendance endpoints ----------
 
 @router.post("/attendance", response_model=MealAttendance)
-def mark_attendance(
+async def mark_attendance(
     req: AttendanceRequest,
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     if user["role"] != "student":
         raise HTTPException(status_code=403, detail="Only students can mark mess attendance")
@@ -114,56 +302,109 @@ def mark_attendance(
     if req.meal not in MEALS:
         raise HTTPException(status_code=400, detail="Invalid meal")
 
-    obj = (
-        db.query(MealAttendanceDB)
-        .filter(MealAttendanceDB.day == req.day, MealAttendanceDB.meal == req.meal)
-        .first()
-    )
-    if obj is None:
-        obj = MealAttendanceDB(day=req.day, meal=req.meal, attendees="")
-        db.add(obj)
-
-    attendees = _attendees_from_str(obj.attendees)
+    username = user["username"]
+    # insert-or-ignore / delete and adjust the headcount only if a row changed,
+    # so double-submits and concurrent check-ins stay consistent
     if req.attending:
-        attendees.add(user["username"])
+        changed = await insert_ignore(
+            db,
+            MealAttendanceEntryDB,
+            [{"day": req.day, "meal": req.meal, "username": username}],
+        )
+        if changed:
+            await _bump_headcount(db, req.day, req.meal, 1)
     else:
-        attendees.discard(user["username"])
-    obj.attendees = _attendees_to_str(attendees)
+        result = await db.execute(
+            delete(MealAttendanceEntryDB).where(
+                MealAttendanceEntryDB.day == req.day,
+                MealAttendanceEntryDB.meal == req.meal,
+                MealAttendanceEntryDB.username == username,
+            )
+        )
+        if result.rowcount:
+            await _bump_headcount(db, req.day, req.meal, -1)
 
-    db.commit()
-    db.refresh(obj)
+    await db.commit()
 
-    return MealAttendance(day=obj.day, meal=obj.meal, attendees=_attendees_from_str(obj.attendees))
+    attendees = {username} if req.attending else set()
+    return MealAttendance(day=req.day, meal=req.meal, attendees=attendees)
 
 
 @router.get("/attendance", response_model=List[MealAttendance])
-def list_attendance(
+async def list_attendance(
     day: Optional[date] = None,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     if user["role"] != "student":
         raise HTTPException(status_code=403, detail="Only students can view their mess attendance")
 
-    q = db.query(MealAttendanceDB)
-    rows = q.all()
-    rows = [r for r in rows if user["username"] in _attendees_from_str(r.attendees)]
+    username = user["username"]
+    stmt = select(MealAttendanceEntryDB.day, MealAttendanceEntryDB.meal).where(
+        MealAttendanceEntryDB.username == username
+    )
     if day:
-        rows = [r for r in rows if r.day == day]
+        stmt = stmt.where(MealAttendanceEntryDB.day == day)
+    if from_date:
+        stmt = stmt.where(MealAttendanceEntryDB.day >= from_date)
+    if to_date:
+        stmt = stmt.where(MealAttendanceEntryDB.day <= to_date)
+
+    result = await db.execute(stmt.order_by(MealAttendanceEntryDB.day, MealAttendanceEntryDB.meal))
+    rows = result.all()
+    return [MealAttendance(day=d, meal=m, attendees={username}) for d, m in rows]
+
+
+@router.get("/attendance/export")
+async def export_attendance(
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    fmt: str = Query("csv", alias="format", pattern="^(csv|xlsx)$"),
+    user=Depends(get_current_user),
+):
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can export mess attendance")
+
+    # (day, meal, username) order walks the unique index
+    stmt = select(MealAttendanceEntryDB.day, MealAttendanceEntryDB.meal, MealAttendanceEntryDB.username)
+    if from_date:
+        stmt = stmt.where(MealAttendanceEntryDB.day >= from_date)
+    if to_date:
+        stmt = stmt.where(MealAttendanceEntryDB.day <= to_date)
+    stmt = stmt.order_by(
+        MealAttendanceEntryDB.day, MealAttendanceEntryDB.meal, MealAttendanceEntryDB.username
+    )
+    return export_response(stmt, ["day", "meal", "username"], "mess_attendance", fmt)
 
-    return [
-        MealAttendance(day=r.day, meal=r.meal, attendees=_attendees_from_str(r.attendees))
-        for r in rows
-    ]
+
+@router.get("/headcount", response_model=MealHeadcount)
+async def get_headcount(
+    day: date,
+    meal: str,
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can view mess headcount")
+
+    if meal not in MEALS:
+        raise HTTPException(status_code=400, detail="Invalid meal")
+
+    obj = await db.scalar(
+        select(MealHeadcountDB).where(MealHeadcountDB.day == day, MealHeadcountDB.meal == meal)
+    )
+    return MealHeadcount(day=day, meal=meal, headcount=obj.headcount if obj else 0)
 
 
 # ---------- stats endpoints ----------
 
 @router.post("/stats", response_model=MealStats)
-def set_stats(
+async def set_stats(
     req: StatsSetRequest,
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     if user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Only admin can set mess stats")
@@ -173,47 +414,54 @@ def set_stats(
     if req.plates_served > req.plates_prepared:
         raise HTTPException(status_code=400, detail="Served cannot exceed prepared")
 
-    obj = (
-        db.query(MealStatsDB)
-        .filter(MealStatsDB.day == req.day, MealStatsDB.meal == req.meal)
-        .first()
-    )
-    if obj is None:
-        obj = MealStatsDB(
-            day=req.day,
-            meal=req.meal,
-            plates_prepared=req.plates_prepared,
-            plates_served=req.plates_served,
-        )
-        db.add(obj)
+    row = {
+        "day": req.day,
+        "meal": req.meal,
+        "plates_prepared": req.plates_prepared,
+        "plates_served": req.plates_served,
+    }
+    # the rollup gets the difference from the old numbers, so hold the row
+    # while it is worked out (same as fees.set_due)
+    key = (MealStatsDB.day == req.day, MealStatsDB.meal == req.meal)
+    locked = select(MealStatsDB.plates_prepared, MealStatsDB.plates_served).where(*key).with_for_update()
+    old = (await db.execute(locked)).one_or_none()
+    if old is None and await insert_ignore(db, MealStatsDB, [row]):
+        await _bump_stats_rollup(db, req.day, req.meal, req.plates_prepared, req.plates_served, 1)
     else:
-        obj.plates_prepared = req.plates_prepared
-        obj.plates_served = req.plates_served
-
-    db.commit()
-    db.refresh(obj)
+        if old is None:
+            # a concurrent first write got there first; it has committed now
+            old = (await db.execute(locked)).one()
+        await upsert(db, MealStatsDB, [row], index_elements=["day", "meal"],
+                     update_columns=["plates_prepared", "plates_served"])
+        await _bump_stats_rollup(
+            db,
+            req.day,
+            req.meal,
+            req.plates_prepared - old.plates_prepared,
+            req.plates_served - old.plates_served,
+            0,
+        )
+    await db.commit()
 
-    return MealStats(
-        day=obj.day,
-        meal=obj.meal,
-        plates_prepared=obj.plates_prepared,
-        plates_served=obj.plates_served,
-    )
+    return MealStats(**row)
 
 
 @router.get("/stats", response_model=List[MealStats])
-def list_stats(
+async def list_stats(
+    response: Response,
     day: Optional[date] = None,
+    page: PageParams = Depends(),
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     if user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Only admin can view mess stats")
 
-    q = db.query(MealStatsDB)
+    stmt = select(MealStatsDB)
     if day:
-        q = q.filter(MealStatsDB.day == day)
-    rows = q.all()
+        stmt = stmt.where(MealStatsDB.day == day)
+    # newest day first, so new stats show up on page one
+    rows = await paginate(db, stmt, [MealStatsDB.day, MealStatsDB.id], page, response, descending=True)
     return [
         MealStats(
             day=r.day,
@@ -223,3 +471,66 @@ def list_stats(
         )
         for r in rows
     ]
+
+
+@router.get("/stats/wastage", response_model=List[WastageBucket])
+async def wastage_analytics(
+    from_date: date,
+    to_date: date,
+    group_by: str = Query("week", pattern="^(week|month)$"),
+    meal: Optional[str] = None,
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # waste ratio and average plates served per meal per week/month, read
+    # from the daily rollup so a year is a few hundred indexed rows
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can view mess stats")
+
+    if meal is not None and meal not in MEALS:
+        raise HTTPException(status_code=400, detail="Invalid meal")
+    if from_date > to_date:
+        raise HTTPException(status_code=400, detail="from_date must not be after to_date")
+
+    period = MealStatsDailyDB.week_start if group_by == "week" else MealStatsDailyDB.month_start
+    stmt = (
+        select(
+            period,
+            MealStatsDailyDB.meal,
+            func.count(MealStatsDailyDB.id),
+            func.sum(MealStatsDailyDB.plates_prepared),
+            func.sum(MealStatsDailyDB.plates_served),
+        )
+        .where(
+            MealStatsDailyDB.day >= from_date,
+            MealStatsDailyDB.day <= to_date,
+            MealStatsDailyDB.entries > 0,
+        )
+        .group_by(MealStatsDailyDB.meal, period)
+        .order_by(MealStatsDailyDB.meal, period)
+    )
+    if meal is not None:
+        stmt = stmt.where(MealStatsDailyDB.meal == meal)
+
+    result = await db.execute(stmt)
+    buckets: List[WastageBucket] = []
+    previous: Dict[str, float] = {}
+    for start, m, days, prepared, served in result.all():
+        prepared = int(prepared or 0)
+        served = int(served or 0)
+        ratio = round((prepared - served) / prepared, 4) if prepared else 0.0
+        buckets.append(
+            WastageBucket(
+                period_start=start,
+                meal=m,
+                days=days,
+                plates_prepared=prepared,
+                plates_served=served,
+                plates_wasted=prepared - served,
+                waste_ratio=ratio,
+                avg_plates_served=round(served / days, 2) if days else 0.0,
+                waste_ratio_change=round(ratio - previous[m], 4) if m in previous else None,
+            )
+        )
+        previous[m] = ratio
+    return buckets
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.metrics import render_metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Prometheus scrape target; per worker process
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
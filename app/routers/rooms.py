@@ -1,11 +1,27 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Response, status
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 
-from app.dependencies import get_db
-from app.models.rooms import RoomDB, RoomCreate, RoomRead
+from app.core.allocation import FreeRoom, StudentPreference, plan_allocation
+from app.core.pagination import PageParams, paginate
+from app.dependencies import get_db, get_read_db
+from app.models.rooms import (
+    BulkAllocateRequest,
+    BulkAllocateResult,
+    PlannedAllocation,
+    RoomAllocation,
+    RoomAllocationDB,
+    RoomDB,
+    RoomCreate,
+    RoomRead,
+    UnplacedStudent,
+)
+from app.models.users import UserDB
 from app.routers.auth import get_current_user
 
 router = APIRouter(prefix="/api/rooms", tags=["rooms"])
@@ -16,16 +32,35 @@ class AllocateRequest(BaseModel):
     room_number: str
 
 
+async def _take_bed(db: AsyncSession, room_id: int) -> bool:
+    # conditional increment: two concurrent allocations can't both take the
+    # last bed, whatever the isolation level
+    result = await db.execute(
+        update(RoomDB)
+        .where(RoomDB.id == room_id, RoomDB.occupied < RoomDB.capacity)
+        .values(occupied=RoomDB.occupied + 1)
+    )
+    return bool(result.rowcount)
+
+
+async def _free_bed(db: AsyncSession, room_id: int) -> None:
+    await db.execute(
+        update(RoomDB)
+        .where(RoomDB.id == room_id, RoomDB.occupied > 0)
+        .values(occupied=RoomDB.occupied - 1)
+    )
+
+
 @router.post("/", response_model=RoomRead)
-def create_room(
+async def create_room(
     data: RoomCreate,
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     if user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Only admin can create rooms")
 
-    existing = db.query(RoomDB).filter(RoomDB.room_number == data.room_number).first()
+    existing = await db.scalar(select(RoomDB).where(RoomDB.room_number == data.room_number))
     if existing:
         raise HTTPException(status_code=400, detail="Room already exists")
 
@@ -36,55 +71,210 @@ def create_room(
         room_type=data.room_type,
     )
     db.add(room)
-    db.commit()
-    db.refresh(room)
+    await db.commit()
+    await db.refresh(room)
     return room
 
 
 @router.get("/", response_model=List[RoomRead])
-def list_rooms(
+async def list_rooms(
+    response: Response,
+    page: PageParams = Depends(),
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    rooms = db.query(RoomDB).all()
-    return rooms
+    return await paginate(db, select(RoomDB), [RoomDB.id], page, response)
+
+
+@router.get("/vacant", response_model=List[RoomRead])
+async def list_vacant_rooms(
+    response: Response,
+    block: Optional[str] = None,
+    room_type: Optional[str] = None,
+    page: PageParams = Depends(),
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    stmt = select(RoomDB).where(RoomDB.occupied < RoomDB.capacity)
+    if block:
+        stmt = stmt.where(RoomDB.block == block)
+    if room_type:
+        stmt = stmt.where(RoomDB.room_type == room_type)
+    return await paginate(db, stmt, [RoomDB.id], page, response)
 
 
 @router.post("/allocate", status_code=status.HTTP_200_OK)
-def allocate_student(
+async def allocate_student(
     payload: AllocateRequest,
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     if user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Only admin can allocate students")
 
-    # 1. Find room
-    room = db.query(RoomDB).filter(RoomDB.room_number == payload.room_number).first()
+    room = await db.scalar(select(RoomDB).where(RoomDB.room_number == payload.room_number))
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
 
-    # 2. Find user
-    student = db.query(UserDB).filter(UserDB.username == payload.username).first()
+    student = await db.scalar(select(UserDB).where(UserDB.username == payload.username))
     if not student:
         raise HTTPException(status_code=404, detail="User not found")
+    if student.role != "student":
+        raise HTTPException(status_code=400, detail="Only students can be allocated a room")
 
-    # 3. Ensure occupants relationship exists (list of UserDB)
-    if room.occupants is None:
-        room.occupants = []
+    current = await db.scalar(
+        select(RoomAllocationDB).where(RoomAllocationDB.username == payload.username)
+    )
+    if current is not None:
+        detail = "User already in this room" if current.room_id == room.id else "User already has a room"
+        raise HTTPException(status_code=400, detail=detail)
 
-    # 4. Capacity check
-    if len(room.occupants) >= room.capacity:
+    if not await _take_bed(db, room.id):
         raise HTTPException(status_code=400, detail="Room is already full")
 
-    # 5. Prevent duplicates
-    if student in room.occupants:
-        raise HTTPException(status_code=400, detail="User already in this room")
-
-    # 6. Allocate
-    room.occupants.append(student)
-    db.add(room)
-    db.commit()
-    db.refresh(room)
+    db.add(RoomAllocationDB(room_id=room.id, username=payload.username))
+    try:
+        await db.commit()
+    except IntegrityError:
+        # a concurrent request allocated the same student first; the
+        # rollback also undoes our occupancy increment
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="User already has a room")
 
     return {"detail": "Student allocated successfully"}
+
+
+@router.post("/allocate/bulk", response_model=BulkAllocateResult)
+async def bulk_allocate(
+    req: BulkAllocateRequest,
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    # semester-start placement: plan every student against the current free
+    # beds, then write the whole plan in one transaction (or just return it)
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can allocate students")
+
+    unplaced = {}
+    wanted = {}
+    for s in req.students:
+        if s.username in wanted or s.username in unplaced:
+            unplaced[s.username] = "Listed more than once"
+            wanted.pop(s.username, None)
+        else:
+            wanted[s.username] = s
+
+    names = list(wanted)
+    roles = {}
+    allocated = set()
+    # chunked IN lists keep every backend under its bound-parameter limit
+    for start in range(0, len(names), 900):
+        chunk = names[start:start + 900]
+        roles.update(
+            (await db.execute(select(UserDB.username, UserDB.role).where(UserDB.username.in_(chunk)))).all()
+        )
+        allocated.update(
+            (
+                await db.execute(
+                    select(RoomAllocationDB.username).where(RoomAllocationDB.username.in_(chunk))
+                )
+            ).scalars()
+        )
+    for name in names:
+        if name not in roles:
+            unplaced[name] = "User not found"
+        elif roles[name] != "student":
+            unplaced[name] = f"Not a student (role: {roles[name]})"
+        elif name in allocated:
+            unplaced[name] = "User already has a room"
+
+    students = [
+        StudentPreference(s.username, s.block, s.room_type, s.roommates)
+        for s in wanted.values()
+        if s.username not in unplaced
+    ]
+    result = await db.execute(
+        select(RoomDB.id, RoomDB.room_number, RoomDB.block, RoomDB.room_type, RoomDB.capacity - RoomDB.occupied)
+        .where(RoomDB.occupied < RoomDB.capacity)
+    )
+    plan = plan_allocation(students, [FreeRoom(*row) for row in result.all()])
+    unplaced.update(plan.unplaced)
+
+    if not req.dry_run and plan.placed:
+        taken = {}
+        for room in plan.placed.values():
+            taken[room.id] = taken.get(room.id, 0) + 1
+        # same conditional increment as _take_bed: if another request took
+        # beds since we read them, abort rather than overfill
+        for room_id, beds in taken.items():
+            result = await db.execute(
+                update(RoomDB)
+                .where(RoomDB.id == room_id, RoomDB.occupied + beds <= RoomDB.capacity)
+                .values(occupied=RoomDB.occupied + beds)
+            )
+            if not result.rowcount:
+                await db.rollback()
+                raise HTTPException(status_code=409, detail="Room occupancy changed during allocation; retry")
+        try:
+            await db.execute(
+                insert(RoomAllocationDB),
+                [{"room_id": room.id, "username": name} for name, room in plan.placed.items()],
+            )
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            raise HTTPException(status_code=409, detail="A student was allocated concurrently; retry")
+
+    return BulkAllocateResult(
+        dry_run=req.dry_run,
+        placed=[
+            PlannedAllocation(username=name, room_number=room.room_number)
+            for name, room in plan.placed.items()
+        ],
+        unplaced=[UnplacedStudent(username=name, reason=reason) for name, reason in unplaced.items()],
+    )
+
+
+@router.delete("/allocate/{username}", status_code=status.HTTP_200_OK)
+async def deallocate_student(
+    username: str,
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can allocate students")
+
+    allocation = await db.scalar(
+        select(RoomAllocationDB).where(RoomAllocationDB.username == username)
+    )
+    if allocation is None:
+        raise HTTPException(status_code=404, detail="Allocation not found")
+
+    # only the request whose DELETE removed the row gives the bed back
+    result = await db.execute(
+        delete(RoomAllocationDB).where(RoomAllocationDB.id == allocation.id)
+    )
+    if result.rowcount:
+        await _free_bed(db, allocation.room_id)
+    await db.commit()
+    return {"detail": "Student deallocated successfully"}
+
+
+@router.get("/allocations", response_model=List[RoomAllocation])
+async def list_allocations(
+    response: Response,
+    room_number: Optional[str] = None,
+    page: PageParams = Depends(),
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    stmt = select(RoomAllocationDB).options(joinedload(RoomAllocationDB.room))
+    if user["role"] != "admin":
+        stmt = stmt.where(RoomAllocationDB.username == user["username"])
+    if room_number:
+        stmt = stmt.join(RoomDB).where(RoomDB.room_number == room_number)
+    rows = await paginate(db, stmt, [RoomAllocationDB.id], page, response)
+    return [
+        RoomAllocation(username=r.username, room_number=r.room.room_number, allocated_at=r.allocated_at)
+        for r in rows
+    ]
@@ -0,0 +1,94 @@
+from datetime import datetime
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.pagination import PageParams, paginate
+from app.core.security import get_password_hash
+from app.dependencies import get_db, get_read_db, invalidate_user
+from app.models.users import UserDB, UserCreate, UserUpdate, UserRead
+from app.routers.auth import get_current_user
+
+router = APIRouter(prefix="/api/users", tags=["users"])
+
+ROLES = {"student", "admin"}
+
+
+@router.post("/", response_model=UserRead)
+async def create_user(
+    data: UserCreate,
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can create users")
+
+    if data.role not in ROLES:
+        raise HTTPException(status_code=400, detail="Invalid role")
+
+    existing = await db.scalar(select(UserDB).where(UserDB.username == data.username))
+    if existing:
+        raise HTTPException(status_code=400, detail="User already exists")
+
+    now = datetime.utcnow()
+    new_user = UserDB(
+        username=data.username,
+        full_name=data.full_name,
+        role=data.role,
+        hashed_password=get_password_hash(data.password),
+        disabled=False,
+        created_at=now,
+        updated_at=now,
+    )
+    db.add(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    return new_user
+
+
+@router.get("/", response_model=List[UserRead])
+async def list_users(
+    response: Response,
+    page: PageParams = Depends(),
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can view users")
+
+    return await paginate(db, select(UserDB), [UserDB.id], page, response)
+
+
+@router.patch("/{username}", response_model=UserRead)
+async def update_user(
+    username: str,
+    data: UserUpdate,
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can update users")
+
+    target = await db.scalar(select(UserDB).where(UserDB.username == username))
+    if target is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    if data.role is not None and data.role not in ROLES:
+        raise HTTPException(status_code=400, detail="Invalid role")
+
+    update_data = data.model_dump(exclude_none=True)
+    password = update_data.pop("password", None)
+    for field, value in update_data.items():
+        setattr(target, field, value)
+    if password is not None:
+        target.hashed_password = get_password_hash(password)
+
+    target.updated_at = datetime.utcnow()
+    await db.commit()
+    await db.refresh(target)
+
+    # cached principals would otherwise keep the old role / enabled state
+    invalidate_user(username)
+    return target
@@ -0,0 +1,270 @@
+# benchmarks/run.py
+#
+# Load test for app.main:app. Seeds a fresh SQLite database (or uses
+# BENCH_DATABASE_URL, e.g. a local PostgreSQL), starts uvicorn against it,
+# drives each workload with concurrent clients and reports p50/p95/p99
+# latency and requests/second per endpoint.
+#
+#   pip install -r benchmarks/requirements.txt
+#   python -m benchmarks.run --save-baseline        # record benchmarks/baseline.json
+#   python -m benchmarks.run                        # compare against it
+#
+# The comparison fails (exit status 1) when an endpoint's p95 grows or its
+# throughput drops by more than --tolerance relative to the baseline.
+# Baselines are machine-specific: record one on the machine you compare on.
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Tuple
+
+import httpx
+
+from benchmarks.seed import BENCH_PASSWORD, seed, student_name
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, "benchmarks", "baseline.json")
+
+Request = Tuple[str, str, dict]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+class Server:
+    def __init__(self, database_url: str, workers: int):
+        self.port = _free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        env = dict(os.environ, DATABASE_URL=database_url)
+        self.proc = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "app.main:app",
+                "--port", str(self.port), "--workers", str(workers), "--log-level", "warning",
+            ],
+            cwd=REPO_ROOT,
+            env=env,
+        )
+
+    def wait_ready(self, timeout: float = 60.0) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+            try:
+                httpx.get(self.base_url + "/api/mess/menu/today", timeout=1.0)
+                return
+            except httpx.TransportError:
+                time.sleep(0.2)
+        raise RuntimeError("server did not become ready")
+
+    def stop(self) -> None:
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+
+async def _login(client: httpx.AsyncClient, username: str, password: str) -> str:
+    r = await client.post("/api/login", data={"username": username, "password": password})
+    r.raise_for_status()
+    return r.json()["access_token"]
+
+
+def _workloads(students: int, student_tokens: List[str], admin_token: str) -> Dict[str, Callable[[random.Random], Request]]:
+    today = date.today()
+    month_ago = (today - timedelta(days=30)).isoformat()
+
+    def student(rng):
+        return {"Authorization": "Bearer " + rng.choice(student_tokens)}
+
+    admin = {"Authorization": "Bearer " + admin_token}
+
+    return {
+        "POST /api/login": lambda rng: (
+            "POST", "/api/login",
+            {"data": {"username": student_name(rng.randrange(students)), "password": BENCH_PASSWORD}},
+        ),
+        "POST /api/mess/attendance": lambda rng: (
+            "POST", "/api/mess/attendance",
+            {"json": {"day": today.isoformat(), "meal": rng.choice(["breakfast", "lunch", "dinner"]),
+                      "attending": rng.random() < 0.8},
+             "headers": student(rng)},
+        ),
+        "GET /api/mess/menu/today": lambda rng: ("GET", "/api/mess/menu/today", {}),
+        "GET /api/mess/attendance": lambda rng: (
+            "GET", "/api/mess/attendance", {"params": {"from_date": month_ago}, "headers": student(rng)},
+        ),
+        "GET /api/hostel-attendance/my": lambda rng: (
+            "GET", "/api/hostel-attendance/my", {"headers": student(rng)},
+        ),
+        "GET /api/gatepass/my": lambda rng: ("GET", "/api/gatepass/my", {"headers": student(rng)}),
+        "GET /api/maintenance/my": lambda rng: ("GET", "/api/maintenance/my", {"headers": student(rng)}),
+        "GET /api/fees/my": lambda rng: ("GET", "/api/fees/my", {"headers": student(rng)}),
+        "GET /api/gatepass/": lambda rng: ("GET", "/api/gatepass/", {"headers": admin}),
+        "GET /api/maintenance/": lambda rng: ("GET", "/api/maintenance/", {"headers": admin}),
+        "GET /api/rooms/": lambda rng: ("GET", "/api/rooms/", {"headers": admin}),
+        "GET /api/fees/page": lambda rng: ("GET", "/api/fees/page", {"headers": admin}),
+        "GET /api/fees/summary": lambda rng: ("GET", "/api/fees/summary", {"headers": admin}),
+        "GET /api/hostel-attendance/day": lambda rng: (
+            "GET", "/api/hostel-attendance/day", {"params": {"day": today.isoformat()}, "headers": admin},
+        ),
+    }
+
+
+async def _run_workload(
+    client: httpx.AsyncClient,
+    make_request: Callable[[random.Random], Request],
+    requests: int,
+    concurrency: int,
+) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker(worker_id: int):
+        nonlocal remaining, errors
+        rng = random.Random(worker_id)
+        while remaining > 0:
+            remaining -= 1
+            method, path, kwargs = make_request(rng)
+            started = time.perf_counter()
+            r = await client.request(method, path, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            if r.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / wall if wall else 0.0,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p95_ms": _percentile(latencies, 95) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+    }
+
+
+async def _drive(base_url: str, students: int, requests: int, concurrency: int, only: List[str]) -> Dict[str, Dict]:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        admin_token = await _login(client, "admin", "admin123")
+        student_tokens = [
+            await _login(client, student_name(i), BENCH_PASSWORD)
+            for i in random.Random(0).sample(range(students), min(students, 200))
+        ]
+        workloads = _workloads(students, student_tokens, admin_token)
+
+        results = {}
+        for name, make_request in workloads.items():
+            if only and not any(o in name for o in only):
+                continue
+            # warm-up so connection setup and first-query costs don't skew p99
+            await _run_workload(client, make_request, min(50, requests), concurrency)
+            results[name] = await _run_workload(client, make_request, requests, concurrency)
+            _print_row(name, results[name])
+        return results
+
+
+def _print_row(name: str, r: Dict) -> None:
+    print(
+        f"{name:<36} {r['rps']:>8.1f} rps  p50 {r['p50_ms']:>7.1f}ms  "
+        f"p95 {r['p95_ms']:>7.1f}ms  p99 {r['p99_ms']:>7.1f}ms  errors {r['errors']}"
+    )
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if r["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {base['p95_ms']:.1f}ms -> {r['p95_ms']:.1f}ms")
+        if r["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {base['rps']:.1f} -> {r['rps']:.1f} rps")
+        if r["errors"] > base.get("errors", 0):
+            regressions.append(f"{name}: errors {base.get('errors', 0)} -> {r['errors']}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the Hostel ERP API.")
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--records", type=int, default=20_000, help="tickets, gate passes and payments each")
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--only", action="append", default=[], help="substring filter on endpoint names")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--output", help="also write results as JSON here")
+    args = parser.parse_args(argv)
+
+    database_url = os.getenv("BENCH_DATABASE_URL")
+    tmpdir = None
+    if database_url is None:
+        tmpdir = tempfile.TemporaryDirectory(prefix="hostel-bench-")
+        database_url = "sqlite:///" + os.path.join(tmpdir.name, "bench.db")
+
+    print(f"seeding {database_url}", file=sys.stderr)
+    os.environ["DATABASE_URL"] = database_url
+    seed(args.students, args.days, args.records, args.records, args.records)
+
+    server = Server(database_url, args.workers)
+    try:
+        server.wait_ready()
+        results = asyncio.run(_drive(server.base_url, args.students, args.requests, args.concurrency, args.only))
+    finally:
+        server.stop()
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare against; run with --save-baseline first")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print("REGRESSION " + line)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
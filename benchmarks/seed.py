@@ -0,0 +1,164 @@
+# benchmarks/seed.py
+#
+# Fill a database with realistic volumes for load testing:
+#
+#   DATABASE_URL=sqlite:///bench.db python -m benchmarks.seed --students 2000 --days 365
+#
+# Defaults: 2,000 students, a year of hostel and mess attendance, and
+# 20,000 each of maintenance tickets, gate passes and payments. All
+# generated students use the password BENCH_PASSWORD.
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert
+
+BENCH_PASSWORD = "bench123"
+BATCH = 10_000
+
+
+def student_name(i: int) -> str:
+    return f"bench{i:05d}"
+
+
+def _batched_insert(db, model, rows) -> int:
+    total = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH:
+            db.execute(insert(model), batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        db.execute(insert(model), batch)
+        total += len(batch)
+    db.commit()
+    return total
+
+
+def seed(students: int, days: int, tickets: int, gatepasses: int, payments: int, rng_seed: int = 42) -> None:
+    # imported here so DATABASE_URL from the command line is honoured
+    from app.database import SessionLocal
+    from app.migrations import open_fee_ledger, run_all
+    from app.models.fees import FeeRecordDB, PaymentDB
+    from app.models.gatepass import GatePassDB
+    from app.models.hostel_attendance import HostelAttendanceEntryDB
+    from app.models.maintenance import MaintenanceTicketDB
+    from app.models.mess import MEALS, DailyMenuDB, MealAttendanceEntryDB, MealHeadcountDB
+    from app.models.rooms import RoomDB
+    from app.models.users import UserDB
+
+    rng = random.Random(rng_seed)
+    run_all()
+    db = SessionLocal()
+    today = date.today()
+    start_day = today - timedelta(days=days - 1)
+    all_days = [start_day + timedelta(days=d) for d in range(days)]
+    names = [student_name(i) for i in range(students)]
+
+    def step(label, model, rows):
+        started = time.perf_counter()
+        n = _batched_insert(db, model, rows)
+        print(f"  {label:<22} {n:>9,} rows  {time.perf_counter() - started:6.1f}s", file=sys.stderr)
+
+    now = datetime.utcnow()
+    step("users", UserDB, (
+        {
+            "username": n, "full_name": f"Bench Student {n}", "role": "student",
+            "hashed_password": BENCH_PASSWORD, "disabled": False,
+            "created_at": now, "updated_at": now,
+        }
+        for n in names
+    ))
+    step("rooms", RoomDB, (
+        {"room_number": f"{block}-{i:03d}", "block": block, "capacity": 3, "room_type": rng.choice(["normal", "ac"])}
+        for block in "ABCDEFGH"
+        for i in range(students // 24 + 1)
+    ))
+    step("hostel attendance", HostelAttendanceEntryDB, (
+        {"day": d, "username": n}
+        for d in all_days
+        for n in names
+        if rng.random() < 0.9
+    ))
+
+    headcounts = {}
+
+    def mess_rows():
+        for d in all_days:
+            for meal in MEALS:
+                count = 0
+                for n in names:
+                    if rng.random() < 0.7:
+                        count += 1
+                        yield {"day": d, "meal": meal, "username": n}
+                headcounts[(d, meal)] = count
+
+    step("mess attendance", MealAttendanceEntryDB, mess_rows())
+    step("mess headcounts", MealHeadcountDB, (
+        {"day": d, "meal": meal, "headcount": count} for (d, meal), count in headcounts.items()
+    ))
+    step("menus", DailyMenuDB, (
+        {"day": d, "meal": meal, "items": "rice,dal,sabzi,roti"}
+        for d in all_days + [today + timedelta(days=1)]
+        for meal in MEALS
+    ))
+
+    def when() -> datetime:
+        return datetime.combine(rng.choice(all_days), datetime.min.time()) + timedelta(seconds=rng.randrange(86400))
+
+    step("maintenance tickets", MaintenanceTicketDB, (
+        {
+            "created_by": rng.choice(names), "room_number": f"A-{rng.randrange(100):03d}",
+            "title": rng.choice(["Leaking tap", "Fan not working", "Broken window", "No hot water"]),
+            "description": "Reported during benchmark seeding",
+            "status": rng.choice(["open", "in_progress", "closed"]),
+            "created_at": ts, "updated_at": ts,
+        }
+        for ts in (when() for _ in range(tickets))
+    ))
+
+    def gatepass_rows():
+        for _ in range(gatepasses):
+            ts = when()
+            leave = ts.date() + timedelta(days=rng.randrange(1, 10))
+            status = rng.choice(["pending", "approved", "approved", "rejected"])
+            yield {
+                "student_username": rng.choice(names), "from_date": leave,
+                "to_date": leave + timedelta(days=rng.randrange(0, 5)), "reason": "Home visit",
+                "status": status, "created_at": ts, "decided_at": None if status == "pending" else ts,
+            }
+
+    step("gate passes", GatePassDB, gatepass_rows())
+    step("fee records", FeeRecordDB, (
+        {"username": n, "total_due": float(rng.choice([0, 5000, 12000, 25000]))} for n in names
+    ))
+    step("payments", PaymentDB, (
+        {"fee_record_id": rng.randrange(1, students + 1), "amount": float(rng.choice([1000, 2500, 5000])), "timestamp": when()}
+        for _ in range(payments)
+    ))
+    open_fee_ledger(db)
+    db.close()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Seed a database for benchmarks.")
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--tickets", type=int, default=20_000)
+    parser.add_argument("--gatepasses", type=int, default=20_000)
+    parser.add_argument("--payments", type=int, default=20_000)
+    args = parser.parse_args(argv)
+
+    if not os.getenv("DATABASE_URL"):
+        parser.error("DATABASE_URL must point at an empty database")
+    seed(args.students, args.days, args.tickets, args.gatepasses, args.payments)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+from collections import Counter
+
+from app.core.allocation import NO_MATCHING_ROOM, FreeRoom, StudentPreference, plan_allocation
+
+
+def student(username, block=None, room_type=None, roommates=()):
+    return StudentPreference(username, block, room_type, list(roommates))
+
+
+def room(id, free, block="A", room_type="normal"):
+    return FreeRoom(id, f"{block}{id}", block, room_type, free)
+
+
+def beds_used(plan):
+    return Counter(r.id for r in plan.placed.values())
+
+
+def test_never_exceeds_free_beds():
+    rooms = [room(1, 2), room(2, 1)]
+    plan = plan_allocation([student(f"s{i}") for i in range(5)], rooms)
+
+    used = beds_used(plan)
+    assert all(used[r.id] <= r.free for r in rooms)
+    assert len(plan.placed) == 3
+    assert plan.unplaced == {"s3": NO_MATCHING_ROOM, "s4": NO_MATCHING_ROOM}
+
+
+def test_rooms_with_no_free_beds_are_ignored():
+    plan = plan_allocation([student("a")], [room(1, 0)])
+    assert plan.placed == {}
+    assert plan.unplaced == {"a": NO_MATCHING_ROOM}
+
+
+def test_partly_filled_room_is_topped_up_first():
+    # best fit: the single goes into the room with one bed left, keeping
+    # the empty triple for a group
+    plan = plan_allocation([student("a")], [room(1, 3), room(2, 1)])
+    assert plan.placed["a"].id == 2
+
+
+def test_bucket_reuse_after_partial_fill():
+    # after "a" takes one bed of the triple, its two remaining beds must be
+    # offered to the pair
+    plan = plan_allocation(
+        [student("a"), student("b", roommates=["c"]), student("c")],
+        [room(1, 3)],
+    )
+    assert {name: r.id for name, r in plan.placed.items()} == {"a": 1, "b": 1, "c": 1}
+    assert plan.unplaced == {}
+
+
+def test_roommate_requests_are_merged_transitively():
+    # a-b and b-c requests make one group of three
+    plan = plan_allocation(
+        [student("a", roommates=["b"]), student("b", roommates=["c"]), student("c")],
+        [room(1, 2), room(2, 3)],
+    )
+    assert {r.id for r in plan.placed.values()} == {2}
+    assert len(plan.placed) == 3
+
+
+def test_roommates_not_in_the_request_are_ignored():
+    plan = plan_allocation([student("a", roommates=["ghost"])], [room(1, 1)])
+    assert plan.placed["a"].id == 1
+
+
+def test_group_larger_than_any_room_is_split():
+    plan = plan_allocation(
+        [student("a", roommates=["b", "c"]), student("b"), student("c")],
+        [room(1, 2), room(2, 1)],
+    )
+    assert set(plan.placed) == {"a", "b", "c"}
+    assert all(beds_used(plan)[r] <= free for r, free in ((1, 2), (2, 1)))
+
+
+def test_pair_shares_a_room_rather_than_two_singles():
+    plan = plan_allocation(
+        [student("a", roommates=["b"]), student("b")],
+        [room(1, 2), room(2, 1), room(3, 1)],
+    )
+    assert plan.placed["a"].id == plan.placed["b"].id == 1
+
+
+def test_group_falls_back_to_singles_when_no_room_fits_together():
+    # room 1 would fit the pair but "x" (more constrained) takes a bed first
+    plan = plan_allocation(
+        [student("a", roommates=["b"]), student("b"), student("x", block="A", room_type="normal")],
+        [room(1, 2), room(2, 1, block="B")],
+    )
+    assert set(plan.placed) | set(plan.unplaced) == {"a", "b", "x"}
+    assert plan.placed["x"].id == 1
+    assert len(plan.placed) == 3
+    assert plan.placed["a"].id != plan.placed["b"].id
+
+
+def test_preferences_restrict_rooms():
+    plan = plan_allocation(
+        [student("a", block="B"), student("b", room_type="ac")],
+        [room(1, 1, block="A"), room(2, 1, block="B"), room(3, 1, block="A", room_type="ac")],
+    )
+    assert plan.placed["a"].id == 2
+    assert plan.placed["b"].id == 3
+
+
+def test_group_uses_first_stated_preference():
+    plan = plan_allocation(
+        [student("a", roommates=["b"]), student("b", block="B")],
+        [room(1, 2, block="A"), room(2, 2, block="B")],
+    )
+    assert plan.placed["a"].id == plan.placed["b"].id == 2
+
+
+def test_unmatched_preference_is_reported():
+    plan = plan_allocation([student("a", block="Z")], [room(1, 4)])
+    assert plan.unplaced == {"a": NO_MATCHING_ROOM}